@@ -1,28 +1,57 @@
-from Bio.Align import PairwiseAligner
-from Bio.Seq import Seq
-import matplotlib.colors as mcolors
-from matplotlib.colors import hsv_to_rgb
+import argparse
+import base64
+import bisect
+import collections
+import collections.abc
+import colorsys
+import contextlib
+import gzip
+import hashlib
+import heapq
+import html
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+
+# Biopython 只在真正比对时才导入（见 LazyAligner）；缓存、导出、性能分析与常驻服务
+# 用到的标准库模块也在相应函数中导入，缩短启动时间
+import numpy as np
 
 # 互补碱基对
 complement = {'A': 'T', 'T': 'A', 'C': 'G', 'G': 'C'}
+COMPLEMENT_TABLE = str.maketrans(complement)
+
+# 碱基编码：A=0, C=1, G=2, T=3，互补碱基的编码之和为 3
+BASE_CODE_TABLE = bytes.maketrans(b'ACGT', bytes([0, 1, 2, 3]))
+# 解码时编码 4（目标序列中的非 A/C/G/T 碱基，见 TARGET_CODE_LOOKUP）还原为 N
+BASE_DECODE_TABLE = bytes.maketrans(bytes([0, 1, 2, 3, 4]), b'ACGTN')
 
-# 生成反向互补序列
+# 生成反向互补序列；seq 为碱基编码数组时返回编码数组
 def reverse_complement(seq):
-    return ''.join([complement[base] for base in reversed(seq)])
+    if isinstance(seq, np.ndarray):
+        return 3 - seq[::-1]
+    return seq.translate(COMPLEMENT_TABLE)[::-1]
 
 # 生成更美观的颜色
 def generate_colors(n):
-    colors = []
-    for i in range(n):
-        hue = (i * 0.618) % 1.0  # 使用黄金比例分布色相
-        saturation = 0.8 if i % 2 else 0.6  # 交替饱和度
-        value = 0.9 if i % 3 else 0.8  # 交替亮度
-        rgb = hsv_to_rgb((hue, saturation, value))
-        rgba = (*rgb, 0.8)  # 提高透明度
-        hex_color = mcolors.rgb2hex(rgb)
-        rgba_color = f"rgba({int(rgb[0]*255)}, {int(rgb[1]*255)}, {int(rgb[2]*255)}, 0.8)"
-        colors.append((hex_color, rgba_color))
-    return colors
+    return [layer_color(i) for i in range(n)]
+
+def layer_color(i):
+    """返回第 i 个颜色层的颜色 (hex, rgba)，与层数无关，常驻服务中新增的颜色层不影响已有颜色"""
+    hue = (i * 0.618) % 1.0  # 使用黄金比例分布色相
+    saturation = 0.8 if i % 2 else 0.6  # 交替饱和度
+    value = 0.9 if i % 3 else 0.8  # 交替亮度
+    rgb = colorsys.hsv_to_rgb(hue, saturation, value)
+    hex_color = '#' + ''.join(f"{round(c * 255):02x}" for c in rgb)
+    rgba_color = f"rgba({int(rgb[0]*255)}, {int(rgb[1]*255)}, {int(rgb[2]*255)}, 0.8)"
+    return hex_color, rgba_color
 
 def calculate_gc_content(seq1, seq2, start1, end1, start2, end2):
     """计算配对区域中的GC含量"""
@@ -45,193 +74,75 @@ def generate_scale_markers():
         for i in range(1, 31)
     )
 
-def generate_base_html(base, annotations, pairings):
+def generate_layers_html(layers):
+    """生成一组颜色层的HTML，颜色与显示状态由 generate_layer_styles 生成的类控制"""
+    return ''.join(f'<i class="color-layer layer-{layer}"></i>' for layer in layers)
+
+def generate_base_html(base, layers_html=''):
     """生成单个碱基的HTML"""
-    base_html = f'<div class="base" style="width: 20px; height: 20px; display: flex; ' \
-                f'align-items: center; justify-content: center; border: 1px solid #e9ecef; ' \
-                f'border-radius: 4px; font-size: 0.9em; font-weight: 500; position: relative;">{base}'
-    
-    # 添加颜色层
+    return f'<div class="base">{base}{layers_html}</div>'
+
+def iter_annotation_runs(length, annotations):
+    """扫描线：将链切分为标注集合相同的连续区段
+
+    生成 (起点, 终点, 颜色层编号元组)，终点不含；复杂度与链长和标注数近似线性。
+    """
+    # 每个标注在起点加入、在终点后一位移除
+    events = {}
     for ann in annotations:
-        hex_color, rgba_color = ann['color']
-        layer_id = f"layer-{pairings.index(ann['pairing'])}"
-        base_html += f'<div class="color-layer" id="{layer_id}" ' \
-                    f'style="position: absolute; top: 0; left: 0; right: 0; bottom: 0; ' \
-                    f'background-color: {rgba_color}; mix-blend-mode: multiply; display: none;"></div>'
-    
-    base_html += '</div>'
-    return base_html
-
-def generate_sequence_row(seq, start, end, annotated_chains, chain, pairings):
-    """生成一行序列的HTML"""
-    row_html = '<div class="sequence-row" style="display: flex; flex-wrap: wrap; margin-bottom: 0px;">'
-    for i in range(start, end):
-        base = seq[i]
-        annotations = [ann for ann in annotated_chains[chain] if ann['start'] <= i <= ann['end']]
-        row_html += generate_base_html(base, annotations, pairings)
-    row_html += '</div>'
-    return row_html
-
-def generate_chain_card(chain, seq, annotated_chains, pairings):
-    """生成单个链的卡片HTML"""
-    card_html = f"""
-    <div class="card" style="margin-bottom: 10px; border-radius: 8px; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">
+        start, end = max(ann['start'], 0), min(ann['end'] + 1, length)
+        if start < end:
+            events.setdefault(start, []).append((1, ann['layer']))
+            events.setdefault(end, []).append((-1, ann['layer']))
+
+    active = {}
+    position = 0
+    for boundary in sorted(events):
+        if boundary > position:
+            yield position, boundary, tuple(sorted(active))
+            position = boundary
+        for delta, layer in events[boundary]:
+            active[layer] = active.get(layer, 0) + delta
+            if not active[layer]:
+                del active[layer]
+    if position < length:
+        yield position, length, tuple(sorted(active))
+
+def generate_sequence_row(seq, start, end, annotations):
+    """逐块生成一行序列的HTML，每个标注集合相同的区段生成一块"""
+    # 只有含 HTML 特殊字符的序列才需要逐个碱基转义
+    bases = seq if html.escape(seq) == seq else [html.escape(base) for base in seq]
+    yield '<div class="sequence-row" style="display: flex; flex-wrap: wrap; margin-bottom: 0px;">'
+    for run_start, run_end, layers in iter_annotation_runs(end, annotations):
+        run_start = max(run_start, start)
+        if run_start >= run_end:
+            continue
+        # 同一区段内的碱基共用颜色层HTML
+        layers_html = generate_layers_html(layers)
+        yield ''.join(generate_base_html(base, layers_html) for base in bases[run_start:run_end])
+    yield '</div>'
+
+def generate_chain_card(chain, seq, annotations):
+    """逐块生成单个链的卡片HTML"""
+    yield f"""
+    <div class="card" data-chain="{html.escape(chain)}" style="margin-bottom: 10px; border-radius: 8px; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">
         <div class="card-header" style="background: #f8f9fa; padding: 1px 15px; border-bottom: 1px solid #e9ecef;">
-            <span style="font-weight: 600; color: #2c3e50;">{chain}</span>
+            <span style="font-weight: 600; color: #2c3e50;">{html.escape(chain)}</span>
             <span style="float: right; color: #6c757d; font-weight: 600;">{len(seq)} nt (3'-5') </span>
         </div>
         <div class="card-body" style="padding: 10px;">
             <!-- 序列显示 -->
             <div class="sequence-bases">
-                {generate_sequence_row(seq, 0, len(seq), annotated_chains, chain, pairings)}
+                """
+    yield from generate_sequence_row(seq, 0, len(seq), annotations)
+    yield """
             </div>
         </div>
     </div>
     """
-    return card_html
-
-def read_sequences_from_file(filename):
-    """从文件中读取序列信息和比对模式"""
-    chains = {}
-    mode = 'strict'  # 默认模式
-    with open(filename, 'r') as f:
-        # 读取第一行判断模式
-        first_line = f.readline().strip().lower()
-        if first_line in ['strict', 'relaxed']:
-            mode = first_line
-        else:
-            # 如果第一行不是模式指定，则作为序列处理
-            if first_line and not first_line.startswith('#'):
-                if ':' in first_line:
-                    name, seq = first_line.split(':', 1)
-                    chains[name.strip()] = seq.strip()
-                else:
-                    default_name = f"Chain{len(chains)+1}"
-                    chains[default_name] = first_line.strip()
-        
-        # 继续读取剩余行
-        for line in f:
-            line = line.strip()
-            if line and not line.startswith('#'):
-                if ':' in line:
-                    name, seq = line.split(':', 1)
-                    chains[name.strip()] = seq.strip()
-                else:
-                    default_name = f"Chain{len(chains)+1}"
-                    chains[default_name] = line.strip()
-    
-    return chains, mode
-
-def initialize_aligner(strict=True):
-    """初始化比对器"""
-    aligner = PairwiseAligner()
-    if strict:
-        # 严格参数设置
-        aligner.mode = 'local'  # 局部比对
-        aligner.match_score = 1  # 匹配得分
-        aligner.mismatch_score = -100  # 不匹配得分
-        aligner.open_gap_score = -100  # 打开空位罚分
-        aligner.extend_gap_score = -100  # 扩展空位罚分
-    else:
-        # 宽松参数设置
-        aligner.mode = 'local'  # 局部比对
-        aligner.match_score = 1  # 匹配得分
-        aligner.mismatch_score = -1  # 不匹配得分
-        aligner.open_gap_score = -5  # 打开空位罚分
-        aligner.extend_gap_score = -5  # 扩展空位罚分
-    return aligner
-
-# 主函数
-def main():
-    # 从文件读取序列和模式
-    chains, mode = read_sequences_from_file('seq_input.txt')
-    
-    # 检查是否读取到序列
-    if not chains:
-        print("错误：未读取到任何序列，请检查 seq_input.txt 文件")
-        return
-    
-    # 打印读取到的序列信息
-    print("成功读取以下序列：")
-    for name, seq in chains.items():
-        print(f"{name}: {seq}")
-    print(f"比对模式：{mode}")
-    
-    # 根据模式初始化比对器
-    current_aligner = initialize_aligner(strict=(mode == 'strict'))
-    
-    # 存储配对信息和颜色
-    pairings = []
-    colors = {}
-
-    # 遍历所有链对，确保每对链只记录一次
-    chain_names = list(chains.keys())
-    processed_pairs = set()  # 用于存储已经处理过的链对
-
-    for i in range(len(chain_names)):
-        for j in range(i + 1, len(chain_names)):  # 从 i+1 开始，避免重复
-            chain1 = chain_names[i]
-            chain2 = chain_names[j]
-            seq1 = chains[chain1]
-            seq2 = chains[chain2]
-
-            # 生成链1的反向互补序列
-            rc_seq1 = reverse_complement(seq1)
-
-            # 使用 PairwiseAligner 进行比对
-            alignments = current_aligner.align(rc_seq1, seq2)
-            if alignments:
-                align = alignments[0]  # 取最优比对
-                # 获取比对长度
-                match_length = align.shape[1]  # 比对长度
-                if match_length >= 5:
-                    # 获取比对区域
-                    target_start = align.aligned[0][0][0]  # 链1的起始位置
-                    target_end = align.aligned[0][-1][-1]  # 链1的结束位置
-                    query_start = align.aligned[1][0][0]  # 链2的起始位置
-                    query_end = align.aligned[1][-1][-1]  # 链2的结束位置
-
-                    # 计算链1上的起始和结束位置
-                    chain1_start = len(seq1) - target_end
-                    chain1_end = len(seq1) - target_start - 1
-                    # 链2上的起始和结束位置
-                    chain2_start = query_start
-                    chain2_end = query_end - 1
-
-                    # 获取比对得分
-                    alignment_score = align.score
-
-                    # 获取比对后的序列
-                    aligned_seq1 = str(align[0][0])  # 比对后的第一条序列
-                    aligned_seq2 = str(align[0][1])  # 比对后的第二条序列
-                    
-                    # 提取实际配对的碱基对（忽略gap）
-                    paired_bases = [(b1, b2) for b1, b2 in zip(aligned_seq1, aligned_seq2) 
-                                  if b1 != '-' and b2 != '-']
-                    
-                    # 计算GC对数量
-                    gc_pairs = calculate_gc_content(seq1, seq2, chain1_start, chain1_end, chain2_start, chain2_end)
-                    
-                    # 修改配对信息记录
-                    pairing = (chain1, chain2, chain1_start, chain1_end, chain2_start, chain2_end, 
-                               alignment_score, calculate_gc_content(seq1, seq2, chain1_start, chain1_end, chain2_start, chain2_end))
-                    pairings.append(pairing)
-                    processed_pairs.add(frozenset({chain1, chain2}))
-
-    # 生成颜色
-    color_list = generate_colors(len(pairings))
-    for i, pairing in enumerate(pairings):
-        colors[pairing] = color_list[i]
-
-    # 为每条链创建标注列表
-    annotated_chains = {chain: [] for chain in chains}
-    for pairing, color in colors.items():
-        chain1, chain2, c1_start, c1_end, c2_start, c2_end, score, gc_pairs = pairing
-        annotated_chains[chain1].append({'start': c1_start, 'end': c1_end, 'color': color, 'pairing': pairing})
-        annotated_chains[chain2].append({'start': c2_start, 'end': c2_end, 'color': color, 'pairing': pairing})
 
-    # 生成 HTML 内容
-    html_content = """
+# 报告页面的头部（样式），其后依次为颜色层样式、页面主体开头、模式指示器、配对按钮和链卡片
+HTML_HEAD = """
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -305,9 +216,11 @@ def main():
                 left: 0;
                 right: 0;
                 bottom: 0;
-                opacity: 0.6;
+                opacity: 0; /* 默认隐藏，由 show-layer-* 类显示 */
+                visibility: hidden;
                 border-radius: 4px;
-                display: none; /* 默认隐藏 */
+                mix-blend-mode: multiply;
+                pointer-events: none;
             }
             .controls {
                 margin-bottom: 15px;
@@ -357,7 +270,7 @@ def main():
                 transform: scale(1.1);
             }
             .color-layer {
-                transition: opacity 0.3s ease;
+                transition: opacity 0.3s ease, visibility 0.3s ease;
             }
             .gc-badge {
                 display: inline-block;
@@ -415,7 +328,24 @@ def main():
                 justify-content: flex-start;  /* 改为从左侧开始 */
                 padding-left: 10px;  /* 添加左边距 */
             }
+            /* 序列中的碱基 */
+            .sequence-row .base {
+                width: 20px;
+                height: 20px;
+                display: flex;
+                align-items: center;
+                justify-content: center;
+                border: 1px solid #e9ecef;
+                border-radius: 4px;
+                font-size: 0.9em;
+                font-weight: 500;
+                position: relative;
+            }
         </style>
+    """
+
+# 报告页面头部之后的页面主体开头（标题与控制区）
+HTML_BODY_START = """
     </head>
     <body>
         <div class="container">
@@ -431,40 +361,8 @@ def main():
                     <div class="d-flex flex-wrap gap-2">
     """
 
-    # 根据当前比对器设置模式指示器
-    is_strict_mode = current_aligner.mismatch_score == -100
-    strict_style = ""  # 移除内联样式，由JavaScript控制
-    relaxed_style = ""  # 移除内联样式，由JavaScript控制
-
-    html_content += f"""
-            <div class="mode-indicator strict-mode" data-initial-mode="{str(is_strict_mode).lower()}">Strict Mode</div>
-            <div class="mode-indicator relaxed-mode">Relaxed Mode</div>
-    """
-
-    # 添加带有得分信息的按钮
-    for i, pairing in enumerate(pairings):
-        hex_color, rgba_color = colors[pairing]
-        chain1, chain2, _, _, _, _, score, gc_pairs = pairing
-        html_content += f"""
-        <button class="btn btn-toggle" onclick="toggleLayer('layer-{i}')" data-score="{score}">
-            <span class="pair-names">{chain1} & {chain2}</span>
-            <span class="score-badge">{int(score)} bp</span>
-            <span class="gc-badge">{gc_pairs} GC pairs</span>
-        </button>
-        """
-
-    html_content += """
-                    </div>
-                </div>
-            </div>
-    """
-
-    # 生成每个链的卡片
-    for chain, seq in chains.items():
-        html_content += generate_chain_card(chain, seq, annotated_chains, pairings)
-    
-    # 添加 JavaScript 和结束标签
-    html_content += """
+# 报告页面的尾部（脚本与页尾）
+HTML_TAIL = """
             <script>
                 // 初始化模式显示
                 function initializeMode() {
@@ -487,29 +385,15 @@ def main():
                     initializeButtons();
                 };
 
-                // 改进的切换效果
+                // 改进的切换效果：颜色层的显示由页面上的 show-layer-* 类控制，过渡效果由CSS实现
                 function toggleLayer(layerId) {
-                    const layers = document.querySelectorAll(`.color-layer#${layerId}`);
-                    const button = document.querySelector(`button[onclick*="${layerId}"]`);
+                    const button = document.querySelector(`button[onclick*="'${layerId}'"]`);
                     
-                    // 切换按钮状态
+                    // 切换按钮状态与颜色层显示
                     button.classList.toggle('selected');
-                    
-                    // 添加更流畅的过渡效果
-                    layers.forEach(layer => {
-                        if (layer.style.display === 'none') {
-                            layer.style.display = 'block';
-                            layer.style.opacity = 0;
-                            setTimeout(() => {
-                                layer.style.opacity = 1;
-                            }, 10);
-                        } else {
-                            layer.style.opacity = 0;
-                            setTimeout(() => {
-                                layer.style.display = 'none';
-                            }, 300);
-                        }
-                    });
+                    const visible = button.classList.contains('selected');
+                    document.body.classList.toggle(`show-${layerId}`, visible);
+                    document.dispatchEvent(new CustomEvent('iriseq:toggle', { detail: { layerId, visible } }));
                 }
 
                 // 改进的按钮初始化
@@ -517,8 +401,7 @@ def main():
                     const buttons = document.querySelectorAll('.btn-toggle');
                     buttons.forEach(button => {
                         const layerId = button.getAttribute('onclick').match(/'(.*?)'/)[1];
-                        const layers = document.querySelectorAll(`.color-layer#${layerId}`);
-                        const isVisible = layers[0].style.display !== 'none';
+                        const isVisible = document.body.classList.contains(`show-${layerId}`);
                         button.classList.toggle('selected', isVisible);
                     });
                 }
@@ -558,11 +441,3297 @@ def main():
     </html>
     """
 
-    # 将 HTML 写入文件
-    with open('dna_alignment_visualization.html', 'w') as f:
-        f.write(html_content)
+def generate_layer_styles(pairings, colors, layers=None):
+    """为每个配对生成一次颜色层样式，所有碱基通过类名共用；layers 见 build_annotations"""
+    rules = []
+    for i in (range(len(pairings)) if layers is None else layers):
+        hex_color, rgba_color = colors[i]
+        rules.append(f'            .layer-{i} {{ background-color: {rgba_color}; }}\n'
+                     f'            .show-layer-{i} .layer-{i} {{ opacity: 1; visibility: visible; }}\n')
+    return f"""
+        <style>
+{''.join(rules)}        </style>"""
+
+def generate_mode_indicator(mode):
+    """生成模式指示器HTML"""
+    # 根据当前比对模式设置模式指示器，显示由JavaScript控制
+    is_strict_mode = mode == 'strict'
+    return f"""
+            <div class="mode-indicator strict-mode" data-initial-mode="{str(is_strict_mode).lower()}">Strict Mode</div>
+            <div class="mode-indicator relaxed-mode">Relaxed Mode</div>
+    """
+
+def generate_pairing_button(i, pairing, stability=None):
+    """生成带有得分信息的配对按钮HTML；stability 为 (ΔG37, Tm) 时附加稳定性标记"""
+    chain1, chain2, _, _, _, _, score, gc_pairs = pairing
+    stability_badge = ''
+    if stability is not None:
+        dg37, tm = stability
+        stability_badge = f"""
+            <span class="gc-badge">ΔG {dg37:.1f} kcal/mol · Tm {tm:.1f} °C</span>"""
+    return f"""
+        <button class="btn btn-toggle" onclick="toggleLayer('layer-{i}')" data-score="{score}">
+            <span class="pair-names">{html.escape(chain1)} &amp; {html.escape(chain2)}</span>
+            <span class="score-badge">{int(score)} bp</span>
+            <span class="gc-badge">{gc_pairs} GC pairs</span>{stability_badge}
+        </button>
+        """
+
+def build_annotations(chains, pairings, layers=None):
+    """为每个配对分配颜色，并为每条链创建标注列表
+
+    颜色按颜色层（默认为配对在 pairings 中的下标）编号，相同的配对信息（如多个评分方案得到的
+    同一区域）也各有自己的颜色。layers 为与 pairings 对应的颜色层编号时（常驻服务中配对的
+    固定编号），colors 为 {颜色层: 颜色}。
+    """
+    # 生成颜色
+    if layers is None:
+        colors, layers = generate_colors(len(pairings)), range(len(pairings))
+    else:
+        colors = {layer: layer_color(layer) for layer in layers}
+
+    # 为每条链创建标注列表
+    annotated_chains = {chain: [] for chain in chains}
+    for layer, pairing in zip(layers, pairings):
+        color = colors[layer]
+        chain1, chain2, c1_start, c1_end, c2_start, c2_end, score, gc_pairs = pairing
+        annotated_chains[chain1].append({'start': c1_start, 'end': c1_end, 'color': color,
+                                         'pairing': pairing, 'layer': layer})
+        annotated_chains[chain2].append({'start': c2_start, 'end': c2_end, 'color': color,
+                                         'pairing': pairing, 'layer': layer})
+    return colors, annotated_chains
+
+# 虚拟化查看器模式下的链数据容器与绘制脚本，数据以 JSON 嵌入在 #iriseq-data 中
+VIRTUAL_VIEWER_HTML = """
+            <div class="card virtual-viewer">
+                <div class="card-header viewer-toolbar">
+                    <button class="btn btn-sm btn-outline-secondary" id="viewer-zoom-out" title="Zoom out">&minus;</button>
+                    <button class="btn btn-sm btn-outline-secondary" id="viewer-zoom-in" title="Zoom in">+</button>
+                    <span class="viewer-status" id="viewer-status"></span>
+                </div>
+                <div class="viewer-scroll" id="viewer-scroll">
+                    <div class="viewer-spacer" id="viewer-spacer">
+                        <canvas id="viewer-canvas"></canvas>
+                    </div>
+                </div>
+            </div>
+            <style>
+                .viewer-toolbar { display: flex; align-items: center; gap: 6px; }
+                .viewer-status { margin-left: auto; color: #6c757d; font-size: 0.85em; font-weight: 500; }
+                .viewer-scroll { height: 75vh; overflow-y: auto; position: relative; }
+                .viewer-spacer { position: relative; }
+                #viewer-canvas { position: absolute; top: 0; left: 0; display: block; }
+            </style>
+    """
+
+VIRTUAL_VIEWER_SCRIPT = """
+            <script>
+                // 虚拟化查看器：只绘制可见窗口内的碱基，页面开销与序列总长无关
+                (function() {
+                    let data = JSON.parse(document.getElementById('iriseq-data').textContent);
+                    const scroller = document.getElementById('viewer-scroll');
+                    const spacer = document.getElementById('viewer-spacer');
+                    const canvas = document.getElementById('viewer-canvas');
+                    const status = document.getElementById('viewer-status');
+                    const ctx = canvas.getContext('2d');
+                    const HEADER = 30, PADDING = 12, CARD_GAP = 10, GAP = 3;
+                    let cell = 20, perRow = 1, offsets = [], total = 0;
+
+                    // 每条链的标注区间 [起点, 终点, 颜色层, 颜色]，以及当前显示的标注；
+                    // data.layers 为配对的颜色层编号（常驻服务），缺省时为配对的下标
+                    let annotations = [], visible = [];
+                    const visibleLayers = new Set();
+
+                    function load() {
+                        annotations = data.chains.map(() => []);
+                        data.pairings.forEach((p, index) => {
+                            const layer = data.layers ? data.layers[index] : index;
+                            annotations[p[0]].push([p[2], p[3], layer, data.colors[index]]);
+                            annotations[p[1]].push([p[4], p[5], layer, data.colors[index]]);
+                        });
+                        updateVisible();
+                    }
+
+                    function updateVisible() {
+                        visible = annotations.map(list => list.filter(a => visibleLayers.has(a[2])));
+                    }
+
+                    // 根据缩放与宽度计算每条链的位置
+                    function layout() {
+                        const fraction = total ? scroller.scrollTop / total : 0;
+                        perRow = Math.max(1, Math.floor((scroller.clientWidth - 2 * PADDING) / (cell + GAP)));
+                        offsets = new Array(data.chains.length + 1);
+                        total = 0;
+                        data.chains.forEach((c, i) => {
+                            offsets[i] = total;
+                            total += HEADER + PADDING + Math.ceil(c[1].length / perRow) * (cell + GAP) + CARD_GAP;
+                        });
+                        offsets[data.chains.length] = total;
+                        spacer.style.height = `${total}px`;
+                        scroller.scrollTop = fraction * total;
+                        const ratio = window.devicePixelRatio || 1;
+                        canvas.width = scroller.clientWidth * ratio;
+                        canvas.height = scroller.clientHeight * ratio;
+                        canvas.style.width = `${scroller.clientWidth}px`;
+                        canvas.style.height = `${scroller.clientHeight}px`;
+                        ctx.setTransform(ratio, 0, 0, ratio, 0, 0);
+                        draw();
+                    }
+
+                    // 二分查找第一条可见的链
+                    function firstVisible(top) {
+                        let lo = 0, hi = data.chains.length - 1;
+                        while (lo < hi) {
+                            const mid = (lo + hi + 1) >> 1;
+                            if (offsets[mid] <= top) lo = mid; else hi = mid - 1;
+                        }
+                        return lo;
+                    }
+
+                    function drawChain(index, y, height) {
+                        const [name, seq] = data.chains[index];
+                        const width = scroller.clientWidth;
+                        ctx.fillStyle = '#f8f9fa';
+                        ctx.fillRect(0, y, width, HEADER);
+                        ctx.fillStyle = '#2c3e50';
+                        ctx.font = '600 14px -apple-system, "Segoe UI", Roboto, Arial, sans-serif';
+                        ctx.textAlign = 'left';
+                        ctx.textBaseline = 'middle';
+                        ctx.fillText(name, 15, y + HEADER / 2);
+                        ctx.fillStyle = '#6c757d';
+                        ctx.textAlign = 'right';
+                        ctx.fillText(`${seq.length} nt (3'-5')`, width - 15, y + HEADER / 2);
+
+                        const step = cell + GAP;
+                        const rows = Math.ceil(seq.length / perRow);
+                        const firstRow = Math.max(0, Math.floor((-y - HEADER - PADDING) / step));
+                        ctx.font = `500 ${Math.round(cell * 0.6)}px Arial, sans-serif`;
+                        ctx.textAlign = 'center';
+                        for (let row = firstRow; row < rows; row++) {
+                            const rowY = y + HEADER + PADDING / 2 + row * step;
+                            if (rowY > height) break;
+                            const start = row * perRow, end = Math.min(seq.length, start + perRow);
+                            // 碱基边框
+                            ctx.strokeStyle = '#e9ecef';
+                            for (let i = start; i < end; i++) {
+                                ctx.strokeRect(PADDING + (i - start) * step + 0.5, rowY + 0.5, cell - 1, cell - 1);
+                            }
+                            // 已显示的配对区域，叠加混合
+                            ctx.globalCompositeOperation = 'multiply';
+                            for (const [s, e, , color] of visible[index]) {
+                                const from = Math.max(s, start), to = Math.min(e + 1, end);
+                                if (from >= to) continue;
+                                ctx.fillStyle = color;
+                                for (let i = from; i < to; i++) {
+                                    ctx.fillRect(PADDING + (i - start) * step, rowY, cell, cell);
+                                }
+                            }
+                            ctx.globalCompositeOperation = 'source-over';
+                            // 缩得太小时不绘制字母
+                            if (cell >= 10) {
+                                ctx.fillStyle = '#1d1d1f';
+                                for (let i = start; i < end; i++) {
+                                    ctx.fillText(seq[i], PADDING + (i - start) * step + cell / 2, rowY + cell / 2 + 1);
+                                }
+                            }
+                        }
+                    }
+
+                    function draw() {
+                        const top = scroller.scrollTop, height = scroller.clientHeight;
+                        canvas.style.transform = `translateY(${top}px)`;
+                        ctx.clearRect(0, 0, scroller.clientWidth, height);
+                        if (!data.chains.length) return;
+                        let index = firstVisible(top);
+                        const first = index;
+                        for (; index < data.chains.length && offsets[index] < top + height; index++) {
+                            drawChain(index, offsets[index] - top, height);
+                        }
+                        status.textContent = `Chains ${first + 1}-${index} of ${data.chains.length}`;
+                    }
+
+                    function zoom(factor) {
+                        cell = Math.min(40, Math.max(4, Math.round(cell * factor)));
+                        layout();
+                    }
+
+                    let pending = false;
+                    scroller.addEventListener('scroll', () => {
+                        if (pending) return;
+                        pending = true;
+                        requestAnimationFrame(() => { pending = false; draw(); });
+                    });
+                    scroller.addEventListener('wheel', e => {
+                        if (!e.ctrlKey) return;
+                        e.preventDefault();
+                        zoom(e.deltaY < 0 ? 1.25 : 0.8);
+                    }, { passive: false });
+                    document.getElementById('viewer-zoom-in').addEventListener('click', () => zoom(1.25));
+                    document.getElementById('viewer-zoom-out').addEventListener('click', () => zoom(0.8));
+                    window.addEventListener('resize', layout);
+
+                    // toggleLayer 切换颜色层后重新绘制
+                    document.addEventListener('iriseq:toggle', e => {
+                        const layer = Number(e.detail.layerId.replace('layer-', ''));
+                        if (e.detail.visible) visibleLayers.add(layer); else visibleLayers.delete(layer);
+                        updateVisible();
+                        draw();
+                    });
+                    // 常驻服务推送新的链与配对数据后重新布局，已显示的颜色层保持显示
+                    document.addEventListener('iriseq:data', e => {
+                        data = e.detail;
+                        load();
+                        layout();
+                    });
+                    load();
+                    layout();
+                })();
+            </script>
+    """
+
+def generate_viewer_data(chains, pairings, colors, layers=None):
+    """逐块生成嵌入页面的链与配对 JSON 数据；layers 见 build_annotations"""
+    chain_index = {chain: i for i, chain in enumerate(chains)}
+    yield '\n            <script id="iriseq-data" type="application/json">{"chains": ['
+    for i, item in enumerate(chains.items()):
+        yield (', ' if i else '') + _json_for_script(list(item))
+    yield '], "pairings": ['
+    for i, pairing in enumerate(pairings):
+        yield (', ' if i else '') + _json_for_script(_viewer_pairing(chain_index, pairing))
+    if layers is None:
+        yield '], "colors": ' + _json_for_script([colors[i][1] for i in range(len(pairings))]) + '}</script>'
+    else:
+        yield ('], "colors": ' + _json_for_script([colors[layer][1] for layer in layers])
+               + ', "layers": ' + _json_for_script(list(layers)) + '}</script>')
+
+def viewer_data(chains, pairings, colors, layers):
+    """返回与 generate_viewer_data 相同的查看器数据（dict），供常驻服务推送给已打开的页面"""
+    chain_index = {chain: i for i, chain in enumerate(chains)}
+    return {'chains': [list(item) for item in chains.items()],
+            'pairings': [_viewer_pairing(chain_index, pairing) for pairing in pairings],
+            'colors': [colors[layer][1] for layer in layers], 'layers': list(layers)}
+
+def _viewer_pairing(chain_index, pairing):
+    """查看器数据中的一个配对：链名换为链的下标"""
+    chain1, chain2, c1_start, c1_end, c2_start, c2_end, score, gc_pairs = pairing
+    return [chain_index[chain1], chain_index[chain2], c1_start, c1_end, c2_start, c2_end, score, gc_pairs]
+
+def _json_for_script(value):
+    """序列化为可安全嵌入 <script> 标签的 JSON"""
+    return json.dumps(value, ensure_ascii=False).replace('</', '<\\/')
+
+# 报告的显示方式：dom 为每个碱基生成一个元素，virtual 为虚拟化查看器
+VIEWS = ('dom', 'virtual')
+
+# 多评分方案报告中的方案切换按钮：切换时只显示该方案的配对按钮，并隐藏其他方案已显示的颜色层
+PROFILE_SWITCHER_STYLE = """
+            <style>
+                .profile-group { display: contents; }
+                .btn-profile {
+                    margin: 3px;
+                    border-radius: 16px;
+                    padding: 5px 10px;
+                    font-size: 0.85rem;
+                    background-color: white;
+                    color: #5856d6;
+                    border: 1px solid #5856d6;
+                }
+                .btn-profile.selected { background-color: #5856d6; color: white; }
+                .btn-profile.selected .score-badge { background-color: rgba(255, 255, 255, 0.2); color: white; }
+            </style>
+    """
+
+PROFILE_SWITCHER_SCRIPT = """
+            <script>
+                function switchProfile(name) {
+                    document.querySelectorAll('.profile-group').forEach(group => {
+                        const active = group.getAttribute('data-profile') === name;
+                        group.style.display = active ? '' : 'none';
+                        if (!active) {
+                            group.querySelectorAll('.btn-toggle.selected').forEach(button => {
+                                toggleLayer(button.getAttribute('onclick').match(/'(.*?)'/)[1]);
+                            });
+                        }
+                    });
+                    let strict = false;
+                    document.querySelectorAll('.btn-profile').forEach(button => {
+                        const active = button.getAttribute('data-profile') === name;
+                        button.classList.toggle('selected', active);
+                        strict = strict || (active && button.getAttribute('data-strict') === 'true');
+                    });
+                    // 模式指示器随方案切换：与严格方案得分相同时显示 Strict Mode
+                    document.querySelector('.strict-mode').style.display = strict ? 'inline-block' : 'none';
+                    document.querySelector('.relaxed-mode').style.display = strict ? 'none' : 'inline-block';
+                }
+                window.addEventListener('load', () => {
+                    switchProfile(document.querySelector('.btn-profile').getAttribute('data-profile'));
+                });
+            </script>
+    """
+
+def generate_profile_switcher(profile_groups):
+    """生成评分方案切换按钮；profile_groups 为 (ScoringProfile, 配对数) 列表，min_length 已确定"""
+    buttons = []
+    for scoring, count in profile_groups:
+        buttons.append(f"""
+            <button class="btn btn-profile" data-profile="{scoring.name}" onclick="switchProfile('{scoring.name}')"
+                    data-strict="{str(scoring_is_strict(scoring)).lower()}">
+                {scoring.name} &middot; {scoring.match:g}/{scoring.mismatch:g}/{scoring.gap:g} &middot; &ge;{scoring.min_length} bp
+                <span class="score-badge">{count}</span>
+            </button>""")
+    return ''.join(buttons) + PROFILE_SWITCHER_STYLE
+
+def generate_report(chains, mode, pairings, colors, annotated_chains, view='dom', navigation='',
+                    stability=None, profile_groups=None, layers=None):
+    """逐块生成完整报告的HTML，内存占用不超过单个链卡片
+
+    navigation 为显示在配对按钮下方的附加HTML，如分页报告的导航栏或常驻服务的更新脚本。
+    stability 为 {配对在 pairings 中的下标: (ΔG37, Tm)}，给出时在按钮上显示稳定性。
+    profile_groups 为 (ScoringProfile, 配对数) 列表时，pairings 依次由各评分方案的配对组成，
+    页面上可以在方案之间切换。layers 为配对的颜色层编号（见 build_annotations），不能与
+    profile_groups 同时使用。
+    """
+    if view not in VIEWS:
+        raise ValueError(f"未知的显示方式：{view}，可选：{', '.join(VIEWS)}")
+    yield HTML_HEAD
+    if view == 'dom':
+        yield generate_layer_styles(pairings, colors, layers)
+    yield HTML_BODY_START
+    yield generate_mode_indicator(mode)
+
+    # 添加带有得分信息的按钮
+    if profile_groups is None:
+        for i, pairing in enumerate(pairings):
+            yield generate_pairing_button(i if layers is None else layers[i], pairing,
+                                          None if stability is None else stability.get(i))
+    else:
+        # 多评分方案：每个方案的配对按钮放在一组中，颜色层按全部配对统一编号
+        yield generate_profile_switcher(profile_groups)
+        first = 0
+        for scoring, count in profile_groups:
+            yield f'\n        <div class="profile-group" data-profile="{scoring.name}">'
+            for i in range(first, first + count):
+                yield generate_pairing_button(i, pairings[i],
+                                              None if stability is None else stability.get(i))
+            yield '\n        </div>'
+            first += count
+        yield PROFILE_SWITCHER_SCRIPT
+
+    yield """
+                    </div>
+                </div>
+            </div>
+    """
+    yield navigation
+
+    if view == 'virtual':
+        # 嵌入链与配对数据，由查看器按可见窗口绘制
+        yield VIRTUAL_VIEWER_HTML
+        yield from generate_viewer_data(chains, pairings, colors, layers)
+        yield VIRTUAL_VIEWER_SCRIPT
+    else:
+        # 生成每个链的卡片
+        for chain, seq in chains.items():
+            yield from generate_chain_card(chain, seq, annotated_chains[chain])
+
+    # 添加 JavaScript 和结束标签
+    yield HTML_TAIL
+
+def write_report(filename, chains, mode, pairings, colors, annotated_chains, view='dom', navigation='',
+                 stability=None, profile_groups=None):
+    """将报告逐块写入文件，返回写入的字符数"""
+    written = 0
+    with open(filename, 'w') as f:
+        for chunk in generate_report(chains, mode, pairings, colors, annotated_chains, view, navigation,
+                                     stability, profile_groups):
+            written += f.write(chunk)
+    return written
+
+PAGE_NAVIGATION_STYLE = """
+            <style>
+                .report-pages .card-body { display: flex; align-items: center; gap: 12px; padding: 8px 15px; }
+                .report-pages a { text-decoration: none; font-weight: 500; }
+                .report-pages .page-status { margin-left: auto; color: #6c757d; font-size: 0.85em; }
+                .page-index td, .page-index th { padding: 6px 12px; font-size: 0.9em; }
+            </style>
+    """
+
+def page_filename(page):
+    """分页报告中第 page 页（从 1 开始）的文件名"""
+    return f"page-{page:04d}.html"
+
+def generate_page_navigation(page, pages, first, last):
+    """生成分页报告的导航栏：索引、上一页、下一页与本页的配对范围"""
+    links = ['<a href="index.html">Index</a>']
+    if page > 1:
+        links.append(f'<a href="{page_filename(page - 1)}">&larr; Previous</a>')
+    if page < pages:
+        links.append(f'<a href="{page_filename(page + 1)}">Next &rarr;</a>')
+    return f"""
+            <nav class="report-pages card">
+                <div class="card-body">
+                    {' '.join(links)}
+                    <span class="page-status">Page {page} of {pages} &middot; pairings {first}&ndash;{last}</span>
+                </div>
+            </nav>{PAGE_NAVIGATION_STYLE}"""
+
+def generate_index_page(mode, page_summaries, total_chains):
+    """逐块生成分页报告的索引页：每页一行，列出配对范围、链数与最高得分"""
+    yield HTML_HEAD
+    yield HTML_BODY_START
+    yield generate_mode_indicator(mode)
+    yield """
+                    </div>
+                </div>
+            </div>
+    """
+    yield PAGE_NAVIGATION_STYLE
+    total_pairings = sum(summary['pairings'] for summary in page_summaries)
+    yield f"""
+            <div class="card page-index">
+                <div class="card-header">{total_pairings} pairings among {total_chains} chains, {len(page_summaries)} pages</div>
+                <div class="card-body">
+                    <table>
+                        <tr><th>Page</th><th>Pairings</th><th>Chains</th><th>Best score</th><th>First pairing</th></tr>
+    """
+    for page, summary in enumerate(page_summaries, 1):
+        yield (f'                        <tr><td><a href="{page_filename(page)}">{page}</a></td>'
+               f'<td>{summary["first"]}&ndash;{summary["last"]}</td><td>{summary["chains"]}</td>'
+               f'<td>{int(summary["best_score"])} bp</td><td>{summary["label"]}</td></tr>\n')
+    yield """
+                    </table>
+                </div>
+            </div>
+    """
+    yield HTML_TAIL
+
+def _write_report_page(args):
+    """写入分页报告的一页（可在工作进程中执行），返回写入的字符数"""
+    filename, chains, mode, pairings, view, navigation, stability = args
+    colors, annotated_chains = build_annotations(chains, pairings)
+    return write_report(filename, chains, mode, pairings, colors, annotated_chains, view, navigation, stability)
+
+def write_paged_report(directory, chains, mode, pairings, view='dom', page_size=200, workers=1, stability=None):
+    """将报告分页写入 directory：index.html 与每页 page_size 个配对的 page-NNNN.html
+
+    每页只包含本页配对涉及的链，可独立打开；各页在进程池中并行生成、分别写入。
+    stability 以配对在 pairings 中的下标为键，每页按本页的颜色层重新编号。返回 (页数, 写入的总字符数)。
+    """
+    os.makedirs(directory, exist_ok=True)
+    tasks, summaries = [], []
+    order = {name: i for i, name in enumerate(chains)}
+    pages = max(1, (len(pairings) + page_size - 1) // page_size)
+    for page in range(1, pages + 1):
+        first = (page - 1) * page_size
+        page_pairings = pairings[first:first + page_size]
+        involved = {name for pairing in page_pairings for name in pairing[:2]}
+        page_chains = {name: chains[name] for name in sorted(involved, key=order.get)}
+        navigation = generate_page_navigation(page, pages, first + 1, first + len(page_pairings))
+        page_stability = None if stability is None else {
+            layer: stability[first + layer] for layer in range(len(page_pairings)) if first + layer in stability}
+        tasks.append((os.path.join(directory, page_filename(page)), page_chains, mode, page_pairings,
+                      view, navigation, page_stability))
+        summaries.append({
+            'first': first + 1, 'last': first + len(page_pairings), 'pairings': len(page_pairings),
+            'chains': len(page_chains),
+            'best_score': max((pairing[6] for pairing in page_pairings), default=0),
+            'label': (f"{html.escape(page_pairings[0][0])} &amp; {html.escape(page_pairings[0][1])}"
+                      if page_pairings else ''),
+        })
+
+    if not workers:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        written = sum(map(_write_report_page, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            written = sum(executor.map(_write_report_page, tasks))
+    with open(os.path.join(directory, 'index.html'), 'w') as f:
+        for chunk in generate_index_page(mode, summaries, len(chains)):
+            written += f.write(chunk)
+    return pages, written
+
+HEATMAP_HTML = """
+            <div class="card heatmap-view">
+                <div class="card-header heatmap-toolbar">
+                    <span>Best pairing score per chain pair</span>
+                    <span class="heatmap-status" id="heatmap-status"></span>
+                </div>
+                <div class="card-body">
+                    <canvas id="heatmap-canvas"></canvas>
+                </div>
+            </div>
+            <style>
+                .heatmap-toolbar { display: flex; align-items: center; gap: 6px; font-weight: 500; }
+                .heatmap-status { margin-left: auto; color: #6c757d; font-size: 0.85em; }
+                #heatmap-canvas { width: min(100%, 75vh); image-rendering: pixelated; cursor: crosshair; }
+            </style>
+    """
+
+HEATMAP_SCRIPT = """
+            <script>
+                // 热图：每个像素为一组链对的最高得分，颜色由浅到深
+                (function() {
+                    const data = JSON.parse(document.getElementById('iriseq-heatmap').textContent);
+                    const canvas = document.getElementById('heatmap-canvas');
+                    const status = document.getElementById('heatmap-status');
+                    const values = Uint8Array.from(atob(data.values), c => c.charCodeAt(0));
+                    canvas.width = canvas.height = data.bins;
+                    const ctx = canvas.getContext('2d');
+                    const image = ctx.createImageData(data.bins, data.bins);
+                    for (let k = 0; k < values.length; k++) {
+                        const t = values[k] / 255;
+                        const rgb = values[k] ? [255 - 66 * t, 237 - 237 * t, 160 - 122 * t] : [255, 255, 255];
+                        image.data.set([...rgb, 255], k * 4);
+                    }
+                    ctx.putImageData(image, 0, 0);
+
+                    const label = (bin) => {
+                        const [first, last] = data.labels[bin];
+                        return first === last ? first : `${first} … ${last}`;
+                    };
+                    const summary = `${data.chains} chains, max score ${data.max_score}`;
+                    status.textContent = summary;
+                    canvas.addEventListener('mousemove', (event) => {
+                        const rect = canvas.getBoundingClientRect();
+                        const col = Math.floor((event.clientX - rect.left) / rect.width * data.bins);
+                        const row = Math.floor((event.clientY - rect.top) / rect.height * data.bins);
+                        if (row < 0 || col < 0 || row >= data.bins || col >= data.bins) return;
+                        const score = Math.round(values[row * data.bins + col] / 255 * data.max_score);
+                        let text = `${label(row)} × ${label(col)}: ${score}`;
+                        if (data.labels[row][0] === data.labels[row][1] && data.labels[col][0] === data.labels[col][1]) {
+                            text += ` (details: --detail "${data.labels[row][0]}" "${data.labels[col][0]}")`;
+                        }
+                        status.textContent = text;
+                    });
+                    canvas.addEventListener('mouseleave', () => { status.textContent = summary; });
+                })();
+            </script>
+    """
+
+def generate_heatmap_report(names, mode, matrix):
+    """逐块生成热图页面：matrix 为 best_score_matrix 的结果，按 uint8 量化后嵌入"""
+    bins = len(matrix)
+    max_score = float(matrix.max()) if matrix.size else 0.0
+    quantized = np.zeros(matrix.shape, dtype=np.uint8)
+    if max_score > 0:
+        quantized = np.round(matrix / max_score * 255).astype(np.uint8)
+    # 每格对应的链下标区间，用首尾链名标注
+    edges = [bin_index * len(names) // bins for bin_index in range(bins + 1)]
+    data = {
+        'chains': len(names),
+        'bins': bins,
+        'max_score': max_score,
+        'labels': [[names[edges[k]], names[edges[k + 1] - 1]] for k in range(bins)],
+        'values': base64.b64encode(quantized.tobytes()).decode('ascii'),
+    }
+    yield HTML_HEAD
+    yield HTML_BODY_START
+    yield generate_mode_indicator(mode)
+    yield """
+                    </div>
+                </div>
+            </div>
+    """
+    yield HEATMAP_HTML
+    yield f'<script type="application/json" id="iriseq-heatmap">{_json_for_script(data)}</script>'
+    yield HEATMAP_SCRIPT
+    yield HTML_TAIL
+
+def write_heatmap(filename, names, mode, matrix):
+    """将热图页面写入文件，返回写入的字符数"""
+    written = 0
+    with open(filename, 'w', encoding='utf-8') as f:
+        for chunk in generate_heatmap_report(names, mode, matrix):
+            written += f.write(chunk)
+    return written
+
+# 比对模式
+MODES = ('strict', 'relaxed')
+
+# IUPAC 核酸字母表中的简并碱基（可识别，但配对分析只支持 A/C/G/T）
+IUPAC_AMBIGUITY_CODES = set('RYSWKMBDHVN')
+
+class SequenceStore(collections.abc.Mapping):
+    """紧凑的序列存储：所有链的碱基编码（uint8，见 BASE_CODE_TABLE）连续存放在一个数组中
+
+    用法与 {链名: 序列} 字典相同，按链名取值时解码为字符串；codes() 返回
+    链的编码数组视图（不复制），可直接交给 reverse_complement 等向量化计算。
+    """
+
+    def __init__(self, records=()):
+        self._names = []
+        self._index = {}
+        buffer = bytearray()
+        offsets = [0]
+        for name, seq in records:
+            if name in self._index:
+                raise ValueError(f"链名重复：{name}")
+            self._index[name] = len(self._names)
+            self._names.append(name)
+            buffer += seq.encode('ascii').translate(BASE_CODE_TABLE)
+            offsets.append(len(buffer))
+        self._codes = np.frombuffer(buffer, dtype=np.uint8)
+        if (self._codes > 3).any():
+            raise ValueError("序列只能包含 A/C/G/T（大写），请先用 normalize_sequence 规范化")
+        self._offsets = np.array(offsets, dtype=np.int64)
+
+    def codes(self, name):
+        """返回链的碱基编码数组（只读视图）"""
+        i = self._index[name]
+        return self._codes[self._offsets[i]:self._offsets[i + 1]]
+
+    def lengths(self):
+        """按存储顺序返回各链长度"""
+        return np.diff(self._offsets)
+
+    def take(self, chains, positions):
+        """逐个取出碱基编码：第 k 个为第 chains[k] 条链位置 positions[k] 上的碱基（位置须在链内）"""
+        return self._codes[self._offsets[np.asarray(chains, dtype=np.int64)] + np.asarray(positions, dtype=np.int64)]
+
+    def gather(self, chains, starts, lengths, reverse=False):
+        """向量化取出多段编码并首尾相接：第 k 段为第 chains[k] 条链从 starts[k] 起的 lengths[k] 个碱基
+
+        reverse 为 True 时每段从 starts[k] 向前（向 5' 端）取。
+        """
+        lengths = np.asarray(lengths, dtype=np.int64)
+        first = self._offsets[np.asarray(chains, dtype=np.int64)] + np.asarray(starts, dtype=np.int64)
+        within = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return self._codes[np.repeat(first, lengths) + (-within if reverse else within)]
+
+    def __getitem__(self, name):
+        return self.codes(name).tobytes().translate(BASE_DECODE_TABLE).decode('ascii')
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def profiles(self):
+        """按存储顺序为每条链构建 ChainProfile，所有链一起向量化计算
+
+        整个编码缓冲区只取一次反向互补、求一次 GC 前缀和，各链的 ChainProfile
+        只记录自己在这些共享缓冲区中的位置，不复制数据。
+        """
+        codes, offsets, total = self._codes, self._offsets, len(self._codes)
+        rc_codes = reverse_complement(codes)
+        gc_prefix = np.zeros(total + 1, dtype=np.int32 if total < 2 ** 31 else np.int64)
+        np.cumsum((codes == 1) | (codes == 2), out=gc_prefix[1:], dtype=gc_prefix.dtype)  # C=1, G=2
+        return [ChainProfile(codes, rc_codes, gc_prefix, start, end)
+                for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+class ChainProfile:
+    """每条链只计算一次、在所有链对之间复用的预处理结果
+
+    只保存链在共享缓冲区中的区间 [start, end)：codes/rc_codes 为碱基编码与反向互补的编码
+    （视图），gc_prefix[e] - gc_prefix[s] 为区间 [s, e) 中 G/C 的个数；seq/rc_seq 在
+    引擎需要字符串时才解码。rc_buffer 为整个缓冲区的反向互补，可为 None。
+    """
+    __slots__ = ('buffer', 'rc_buffer', 'gc_buffer', 'start', 'end')
+
+    def __init__(self, buffer, rc_buffer, gc_buffer, start=0, end=None):
+        self.buffer = buffer
+        self.rc_buffer = rc_buffer
+        self.gc_buffer = gc_buffer
+        self.start = start
+        self.end = len(buffer) if end is None else end
+
+    @property
+    def codes(self):
+        return self.buffer[self.start:self.end]
+
+    @property
+    def rc_codes(self):
+        if self.rc_buffer is None:
+            return None
+        total = len(self.buffer)
+        return self.rc_buffer[total - self.end:total - self.start]
+
+    @property
+    def gc_prefix(self):
+        return self.gc_buffer[self.start:self.end + 1]
+
+    @property
+    def seq(self):
+        return self.codes.tobytes().translate(BASE_DECODE_TABLE).decode('ascii')
+
+    @property
+    def rc_seq(self):
+        return self.rc_codes.tobytes().translate(BASE_DECODE_TABLE).decode('ascii')
+
+    def __len__(self):
+        return self.end - self.start
+
+    def gc_count(self, start, end):
+        """返回区间 [start, end) 中 G/C 的个数，O(1)"""
+        return int(self.gc_buffer[self.start + end] - self.gc_buffer[self.start + start])
+
+def build_chain_profiles(chains):
+    """按 chains 的顺序返回每条链的 ChainProfile；chains 可为 SequenceStore 或 {链名: 序列}"""
+    if not isinstance(chains, SequenceStore):
+        chains = SequenceStore(chains.items())
+    return chains.profiles()
+
+def normalize_sequence(seq, name, line_number=None):
+    """规范化序列：转为大写、U 替换为 T，并检查是否非空且只含 A/C/G/T"""
+    seq = seq.upper().replace('U', 'T')
+    where = f"第 {line_number} 行（{name}）" if line_number is not None else f"链 {name} "
+    if not seq:
+        raise ValueError(f"{where}序列为空")
+    invalid = set(seq) - set('ACGT')
+    if invalid:
+        letters = ''.join(sorted(invalid))
+        if invalid <= IUPAC_AMBIGUITY_CODES:
+            raise ValueError(f"{where}含简并碱基 {letters}，暂不支持，请替换为确定的碱基")
+        raise ValueError(f"{where}含非法字符 {letters!r}")
+    return seq
+
+def open_sequence_file(filename):
+    """以文本方式打开序列文件，gzip 压缩文件自动解压"""
+    with open(filename, 'rb') as f:
+        compressed = f.read(2) == b'\x1f\x8b'
+    if compressed:
+        return gzip.open(filename, 'rt')
+    return open(filename, 'r')
+
+def _header_name(header):
+    """取 FASTA/FASTQ 标题行（不含 > 或 @）的第一个词作为链名"""
+    words = header.split(maxsplit=1)
+    return words[0] if words else ''
+
+def iter_text_records(lines, first_number=1):
+    """解析每行 "名称: 序列" 的文本格式，生成 (名称, 序列, 行号)；无名称时自动命名"""
+    count = 0
+    for line_number, line in enumerate(lines, first_number):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            if ':' in line:
+                name, seq = line.split(':', 1)
+                name = name.strip()
+            else:
+                name, seq = f"Chain{count+1}", line
+            count += 1
+            yield name, seq.strip(), line_number
+
+def iter_fasta_records(lines, first_number=1):
+    """流式解析 FASTA，生成 (名称, 序列, 行号)；名称取标题行的第一个词"""
+    name, parts, header_number = None, [], 0
+    for line_number, line in enumerate(lines, first_number):
+        line = line.strip()
+        if line.startswith('>'):
+            if name is not None:
+                yield name, ''.join(parts), header_number
+            name, parts, header_number = _header_name(line[1:]), [], line_number
+        elif line and not line.startswith(';'):
+            if name is None:
+                raise ValueError(f"第 {line_number} 行：FASTA 序列缺少 > 标题行")
+            parts.append(line)
+    if name is not None:
+        yield name, ''.join(parts), header_number
+
+def iter_fastq_records(lines, first_number=1):
+    """流式解析 FASTQ，生成 (名称, 序列, 行号)；质量值只用于确定记录边界"""
+    lines = enumerate(lines, first_number)
+    for line_number, line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith('@'):
+            raise ValueError(f"第 {line_number} 行：FASTQ 记录应以 @ 开头")
+        name = _header_name(line[1:])
+        parts = []
+        for _, line in lines:
+            line = line.strip()
+            if line.startswith('+'):
+                break
+            parts.append(line)
+        seq = ''.join(parts)
+        quality = 0
+        while quality < len(seq):
+            _, line = next(lines, (None, ''))
+            if not line:
+                raise ValueError(f"第 {line_number} 行（{name}）：FASTQ 质量行不完整")
+            quality += len(line.strip())
+        yield name, seq, line_number
+
+def read_sequences_from_file(filename):
+    """从文件中读取序列信息和比对模式，返回 (SequenceStore, 模式)
+
+    支持每行 "名称: 序列" 的文本格式（第一行可指定 strict/relaxed）、FASTA 与
+    FASTQ（按首个非空行自动识别），以及它们的 gzip 压缩文件。序列逐条读取，
+    U 转为 T 并检查碱基；链名重复时报错，而不是覆盖先前的链。
+    FASTA/FASTQ 文件不含模式，默认使用严格模式。
+    """
+    mode = 'strict'  # 默认模式
+    with open_sequence_file(filename) as f:
+        first_number = 1
+        first_line = f.readline()
+        while first_line and not first_line.strip():
+            first_line = f.readline()
+            first_number += 1
+        lines = itertools.chain([first_line], f)
+        if first_line.startswith('>'):
+            records = iter_fasta_records(lines, first_number)
+        elif first_line.startswith('@'):
+            records = iter_fastq_records(lines, first_number)
+        else:
+            # 读取第一行判断模式，如果第一行不是模式指定，则作为序列处理
+            if first_line.strip().lower() in MODES:
+                mode = first_line.strip().lower()
+                lines, first_number = f, first_number + 1
+            records = iter_text_records(lines, first_number)
+        chains = SequenceStore(_checked_records(records))
+    return chains, mode
+
+def _checked_records(records):
+    """规范化每条序列，为无名称的记录自动命名，并在链名重复时报错"""
+    seen = set()
+    for count, (name, seq, line_number) in enumerate(records, 1):
+        name = name or f"Chain{count}"
+        if name in seen:
+            raise ValueError(f"第 {line_number} 行：链名 {name} 重复")
+        seen.add(name)
+        yield name, normalize_sequence(seq, name, line_number)
+
+# 评分方案：匹配、错配与空位（线性）得分，以及最小配对长度（None 时使用命令行的 --min-length）
+ScoringProfile = collections.namedtuple('ScoringProfile', 'name match mismatch gap min_length', defaults=(None,))
+
+# 内置评分方案，与 initialize_aligner 的严格 / 宽松参数相同
+SCORING_PRESETS = {
+    'strict': ScoringProfile('strict', 1, -100, -100),
+    'relaxed': ScoringProfile('relaxed', 1, -1, -5),
+}
+
+def parse_scoring_profile(text):
+    """解析评分方案：内置方案名（strict、relaxed），或 名称=匹配,错配,空位[,最小长度]"""
+    name, _, values = text.partition('=')
+    if not re.fullmatch(r'[A-Za-z0-9_.-]+', name):
+        raise ValueError(f"评分方案名只能包含字母、数字、_ . -：{name!r}")
+    if not values:
+        if name not in SCORING_PRESETS:
+            raise ValueError(f"未知的评分方案：{name}，内置方案：{', '.join(SCORING_PRESETS)}")
+        return SCORING_PRESETS[name]
+    fields = values.split(',')
+    if len(fields) not in (3, 4):
+        raise ValueError(f"评分方案 {name} 应为 名称=匹配,错配,空位[,最小长度]")
+    try:
+        match, mismatch, gap = (float(field) for field in fields[:3])
+        min_length = int(fields[3]) if len(fields) == 4 else None
+    except ValueError:
+        raise ValueError(f"评分方案 {name} 的得分与最小长度应为数字") from None
+    if match <= 0 or mismatch >= 0 or gap >= 0:
+        raise ValueError(f"评分方案 {name} 的匹配得分应为正数，错配与空位得分应为负数")
+    return ScoringProfile(name, match, mismatch, gap, min_length)
+
+def scoring_is_strict(scoring):
+    """得分与内置严格方案相同的评分方案按严格模式处理（后缀自动机引擎、种子预筛选）"""
+    return scoring[1:4] == SCORING_PRESETS['strict'][1:4]
+
+def initialize_aligner(strict=True, scoring=None):
+    """初始化比对器；scoring 为 ScoringProfile 时使用其中的得分，忽略 strict"""
+    from Bio.Align import PairwiseAligner
+
+    aligner = PairwiseAligner()
+    if scoring is not None:
+        aligner.mode = 'local'
+        aligner.match_score = scoring.match
+        aligner.mismatch_score = scoring.mismatch
+        aligner.open_gap_score = scoring.gap
+        aligner.extend_gap_score = scoring.gap
+    elif strict:
+        # 严格参数设置
+        aligner.mode = 'local'  # 局部比对
+        aligner.match_score = 1  # 匹配得分
+        aligner.mismatch_score = -100  # 不匹配得分
+        aligner.open_gap_score = -100  # 打开空位罚分
+        aligner.extend_gap_score = -100  # 扩展空位罚分
+    else:
+        # 宽松参数设置
+        aligner.mode = 'local'  # 局部比对
+        aligner.match_score = 1  # 匹配得分
+        aligner.mismatch_score = -1  # 不匹配得分
+        aligner.open_gap_score = -5  # 打开空位罚分
+        aligner.extend_gap_score = -5  # 扩展空位罚分
+    return aligner
+
+class LazyAligner:
+    """与 initialize_aligner 的结果得分相同的比对器，第一次调用 align 时才导入 Biopython
+
+    后缀自动机、NumPy 批量比对、得分上界与缓存键只读取得分，不需要构建
+    PairwiseAligner；只有真正比对（Biopython 引擎或回退）时才付出导入的开销。
+    """
+    mode = 'local'
+
+    def __init__(self, strict=True, scoring=None):
+        self.strict = strict
+        self.scoring = scoring
+        if scoring is None:
+            scoring = SCORING_PRESETS['strict' if strict else 'relaxed']
+        # 与 PairwiseAligner 一样以浮点数表示得分，缓存键保持不变
+        self.match_score = float(scoring.match)
+        self.mismatch_score = float(scoring.mismatch)
+        self.open_gap_score = self.extend_gap_score = float(scoring.gap)
+        self._aligner = None
+
+    def align(self, seqA, seqB):
+        if self._aligner is None:
+            self._aligner = initialize_aligner(self.strict, self.scoring)
+        return self._aligner.align(seqA, seqB)
+
+class SuffixAutomaton:
+    """序列的后缀自动机，用于线性时间查找最长公共子串（严格模式专用）
+
+    seq 可为字符串，也可为碱基编码的 bytes（ChainProfile.codes.tobytes()），查询时用同一种表示。
+    """
+
+    def __init__(self, seq):
+        self.next = [{}]  # 状态转移
+        self.link = [-1]  # 后缀链接
+        self.length = [0]  # 状态对应的最长子串长度
+        self.firstpos = [-1]  # 子串首次出现的结束位置
+        last = 0
+        for pos, base in enumerate(seq):
+            last = self._extend(last, base, pos)
+
+    def _new_state(self, length, firstpos, transitions=None, link=-1):
+        self.next.append(dict(transitions) if transitions else {})
+        self.link.append(link)
+        self.length.append(length)
+        self.firstpos.append(firstpos)
+        return len(self.length) - 1
+
+    def _extend(self, last, base, pos):
+        cur = self._new_state(self.length[last] + 1, pos)
+        p = last
+        while p != -1 and base not in self.next[p]:
+            self.next[p][base] = cur
+            p = self.link[p]
+        if p == -1:
+            self.link[cur] = 0
+            return cur
+        q = self.next[p][base]
+        if self.length[p] + 1 == self.length[q]:
+            self.link[cur] = q
+            return cur
+        clone = self._new_state(self.length[p] + 1, self.firstpos[q], self.next[q], self.link[q])
+        while p != -1 and self.next[p].get(base) == q:
+            self.next[p][base] = clone
+            p = self.link[p]
+        self.link[q] = clone
+        self.link[cur] = clone
+        return cur
+
+    def longest_common_substring(self, text):
+        """返回 (长度, text 中的结束位置, 本序列中的结束位置)，结束位置不含
+
+        长度相同时取 text 中最先结束的子串，并取其在本序列中的首次出现，
+        与 PairwiseAligner 返回的第一条最优局部比对一致。
+        """
+        state, matched = 0, 0
+        best = (0, 0, 0)
+        next_, link, length = self.next, self.link, self.length
+        for pos, base in enumerate(text):
+            while state and base not in next_[state]:
+                state = link[state]
+                matched = length[state]
+            state = next_[state].get(base, 0)
+            matched = matched + 1 if state else 0
+            if matched > best[0]:
+                best = (matched, pos + 1, self.firstpos[state] + 1)
+        return best
+
+def build_pairing(chain1, chain2, profile1, profile2, target_start, target_end, query_start, query_end, score):
+    """由比对区域构建配对信息
+
+    profile1/profile2 为两条链的 ChainProfile。target_start/target_end 为反向互补
+    序列上的比对区域，query_start/query_end 为链2上的比对区域，均为左闭右开区间。
+    """
+    # 计算链1上的起始和结束位置
+    chain1_start = len(profile1) - target_end
+    chain1_end = len(profile1) - target_start - 1
+    # 链2上的起始和结束位置
+    chain2_start = query_start
+    chain2_end = query_end - 1
+
+    # 计算GC对数量（与 calculate_gc_content 相同，由前缀和直接得到）
+    gc_pairs = (profile1.gc_count(chain1_start, chain1_end + 1)
+                + profile2.gc_count(chain2_start, chain2_end + 1)) // 2
+
+    return (chain1, chain2, chain1_start, chain1_end, chain2_start, chain2_end, score, gc_pairs)
+
+def align_pair_strict(aligner, chain1, chain2, profile1, profile2, automaton2, min_length=5):
+    """严格模式下用后缀自动机比对一对链，结果与 align_pair 相同
+
+    严格模式中错配与空位罚分极高，最优局部比对即为反向互补序列与链2的
+    最长公共子串。只有当公共子串长度达到罚分绝对值时，带错配或空位的比对
+    才可能得分相当，此时回退到 PairwiseAligner。
+    """
+    length, target_end, query_end = automaton2.longest_common_substring(profile1.rc_codes.tobytes())
+    if length * aligner.match_score >= min(-aligner.mismatch_score, -aligner.open_gap_score):
+        return align_pair(aligner, chain1, chain2, profile1, profile2, min_length)
+    if length == 0 or length < min_length:
+        return None
+    return build_pairing(chain1, chain2, profile1, profile2, target_end - length, target_end,
+                         query_end - length, query_end, float(length * aligner.match_score))
+
+def best_local_alignment(aligner, target, query):
+    """用 PairwiseAligner 求最优局部比对，返回 (得分, target_start, target_end, query_start, query_end, 比对长度)
+
+    区间左闭右开；没有比对时返回 None。
+    """
+    alignments = aligner.align(target, query)
+    if not alignments:
+        return None
+    align = alignments[0]  # 取最优比对
+    return (align.score,
+            int(align.aligned[0][0][0]), int(align.aligned[0][-1][-1]),  # 反向互补序列上的区域
+            int(align.aligned[1][0][0]), int(align.aligned[1][-1][-1]),  # 链2上的区域
+            align.shape[1])  # 比对长度
+
+def align_pair(aligner, chain1, chain2, profile1, profile2, min_length=5):
+    """比对一对链（ChainProfile），返回配对信息；无有效配对时返回 None"""
+    # 使用 PairwiseAligner 比对链1的反向互补序列与链2
+    best = best_local_alignment(aligner, profile1.rc_seq, profile2.seq)
+    if best is None or best[5] < min_length:
+        return None
+    score, target_start, target_end, query_start, query_end, _ = best
+    return build_pairing(chain1, chain2, profile1, profile2, target_start, target_end,
+                         query_start, query_end, score)
+
+def _mask(seq, regions):
+    """将 seq 中的区域 [(start, end), ...] 替换为 N，使其不能再与任何碱基匹配"""
+    for start, end in regions:
+        seq = seq[:start] + 'N' * (end - start) + seq[end:]
+    return seq
+
+def align_pair_sites(aligner, chain1, chain2, profile1, profile2, min_length=5, max_sites=1, min_site_score=None):
+    """用 PairwiseAligner 逐个找出一对链的互不重叠配对区域，返回配对信息列表
+
+    用于批量比对内核放不下的长链对，结果的含义与 align_pairs_batch 相同。PairwiseAligner
+    不能像批量内核那样只禁用已找到区域在两条链上的交叉部分，因此每轮比对两次：一次屏蔽
+    链2上已找到的区域、一次屏蔽反向互补序列上的区域，两种比对都不会经过已找到的区域，
+    取得分较高者（相同时取前者）。链1的一个位点仍可与链2上的多个重复位点分别配对，反之亦然。
+    """
+    target, query = profile1.rc_seq, profile2.seq
+    results, found = [], []
+    for _ in range(max_sites if max_sites == 1 else 2 * max_sites):
+        candidates = [best_local_alignment(aligner, target, query)]
+        if found:
+            candidates = [best_local_alignment(aligner, target, _mask(query, [region[2:4] for region in found])),
+                          best_local_alignment(aligner, _mask(target, [region[:2] for region in found]), query)]
+        candidates = [candidate for candidate in candidates if candidate is not None]
+        if not candidates:
+            break
+        score, ts, te, qs, qe, length = max(candidates, key=lambda candidate: candidate[0])
+        if score <= 0 or length < min_length or (min_site_score is not None and score < min_site_score):
+            break
+        reported = not any(ts < r_te and r_ts < te and qs < r_qe and r_qs < qe
+                           for r_ts, r_te, r_qs, r_qe, r_reported in found if r_reported)
+        if reported:
+            results.append(build_pairing(chain1, chain2, profile1, profile2, ts, te, qs, qe, score))
+        found.append((ts, te, qs, qe, reported))
+        if len(results) >= max_sites:
+            break
+    return results
+
+# 批量比对时每批动态规划矩阵的单元数上限（按 batch_cells 计算，int32 约 32 MB），
+# 单个链对超过时回退到 Biopython（见 align_pair_sites）
+MAX_BATCH_CELLS = 8_000_000
+
+def batch_cells(target_length, query_length):
+    """smith_waterman_batch 中每对序列的动态规划矩阵单元数（按反对角线存储）"""
+    return (target_length + query_length + 1) * (min(target_length, query_length) + 1)
+
+def supports_batch_alignment(aligner):
+    """批量比对内核只支持整数得分、线性空位罚分的局部比对"""
+    scores = (aligner.match_score, aligner.mismatch_score, aligner.open_gap_score)
+    return (aligner.mode == 'local' and aligner.open_gap_score == aligner.extend_gap_score
+            and all(float(score).is_integer() for score in scores))
+
+def encode_batch(seqs, width, pad):
+    """将一批碱基编码数组填充到相同长度，合并为 uint8 数组"""
+    encoded = np.full((len(seqs), width), pad, dtype=np.uint8)
+    for row, seq in enumerate(seqs):
+        encoded[row, :len(seq)] = seq
+    return encoded
+
+def smith_waterman_batch(targets, queries, match_score, mismatch_score, gap_score, forbidden=None):
+    """批量 Smith-Waterman 局部比对（线性空位罚分），沿反对角线对整批向量化
+
+    targets/queries 为碱基编码数组（见 BASE_CODE_TABLE）。
+    返回数组 (score, target_start, target_end, query_start, query_end, length)，
+    每个元素对应一对序列，区间左闭右开，length 为比对列数（含空位）。
+    最优终点与回溯顺序与 PairwiseAligner 的第一条最优比对一致：
+    终点取按行优先顺序的第一个最高分单元，回溯时优先空位（先左后上）、其次对角线。
+    forbidden 为每对序列的禁用区域列表 [(target_start, target_end, query_start, query_end), ...]，
+    比对路径不能经过这些区域内的单元，用于在已找到的配对之外继续搜索。
+    """
+    batch = len(targets)
+    n = max(len(t) for t in targets)
+    m = max(len(q) for q in queries)
+    # 填充字符互不相同且不同于任何碱基，填充位置只会产生错配；
+    # 批次维放在最后，使每一步访问的内存连续
+    target_codes = encode_batch(targets, n, 4).T
+    reversed_query_codes = np.ascontiguousarray(encode_batch(queries, m, 5)[:, ::-1].T)
+
+    # 同一反对角线上的单元互不依赖，可与整批一起向量化计算。
+    # 按反对角线存储：D[d, k] 对应 H[i, d - i]，其中 k = i - max(0, d - m)，
+    # 每条反对角线只占 min(n, m) + 1 个单元，每一步只需连续切片
+    D = np.zeros((n + m + 1, min(n, m) + 1, batch), dtype=np.int32)
+    match_score, mismatch_score, gap_score = np.int32(match_score), np.int32(mismatch_score), np.int32(gap_score)
+    blocked = None
+    if forbidden is not None:
+        blocked = np.zeros(D.shape, dtype=bool)
+        for b, regions in enumerate(forbidden):
+            for target_start, target_end, query_start, query_end in regions:
+                i = np.arange(target_start + 1, target_end + 1)[:, None]
+                j = np.arange(query_start + 1, query_end + 1)[None, :]
+                blocked[i + j, i - np.maximum(i + j - m, 0), b] = True
+
+    for d in range(2, n + m + 1):
+        lo, hi = max(1, d - m), min(n, d - 1) + 1
+        # H[i-1][j-1] 与 H[i-1][j]、H[i][j-1] 分别位于第 d-2 与 d-1 条反对角线
+        prev1, prev2 = max(0, d - 1 - m), max(0, d - 2 - m)
+        matches = target_codes[lo - 1:hi - 1] == reversed_query_codes[m - d + lo:m - d + hi]
+        diagonal = D[d - 2, lo - 1 - prev2:hi - 1 - prev2] + np.where(matches, match_score, mismatch_score)
+        gap = np.maximum(D[d - 1, lo - 1 - prev1:hi - 1 - prev1], D[d - 1, lo - prev1:hi - prev1]) + gap_score
+        offset = max(0, d - m)
+        cells = D[d, lo - offset:hi - offset]
+        np.maximum(np.maximum(diagonal, gap, out=gap), 0, out=cells)
+        if blocked is not None:
+            cells[blocked[d, lo - offset:hi - offset]] = 0
+
+    # 最优终点取按行优先顺序（先 i 后 j）的第一个最高分单元：只在含最高分的反对角线上
+    # 查找各自第一个（i 最小的）最高分单元，再取 i 最小、其次 d 最小者。
+    # 填充区域的得分严格小于其来源单元，最高分单元必然位于真实序列范围内
+    diagonal_best = D.max(axis=1)
+    scores = diagonal_best.max(axis=0)
+    target_end = np.zeros(batch, dtype=np.int64)
+    query_end = np.zeros(batch, dtype=np.int64)
+    d, b = np.nonzero((diagonal_best == scores) & (scores > 0))
+    if d.size:
+        first = (D[d, :, b] == scores[b][:, None]).argmax(axis=1) + np.maximum(d - m, 0)
+        order = np.lexsort((d, first, b))
+        b, first, d = b[order], first[order], d[order]
+        leading = np.r_[True, b[1:] != b[:-1]]
+        target_end[b[leading]] = first[leading]
+        query_end[b[leading]] = d[leading] - first[leading]
+
+    # 向量化回溯，直到得分降为 0；H[i, j] 即 D[i + j, i - max(0, i + j - m)]
+    i, j = target_end.copy(), query_end.copy()
+    length = np.zeros(batch, dtype=np.int64)
+    active = np.nonzero(scores > 0)[0]
+    while active.size:
+        ia, ja = i[active], j[active]
+        h = D[ia + ja, ia - np.maximum(ia + ja - m, 0), active]
+        moving = h > 0
+        active, ia, ja, h = active[moving], ia[moving], ja[moving], h[moving]
+        if not active.size:
+            break
+        # 与 PairwiseAligner 相同：先查询序列方向的空位（左），再目标序列方向（上），最后对角线
+        offset = np.maximum(ia + ja - 1 - m, 0)
+        left = D[ia + ja - 1, ia - offset, active] + gap_score == h
+        up = ~left & (D[ia + ja - 1, ia - 1 - offset, active] + gap_score == h)
+        diagonal = ~up & ~left
+        i[active] = ia - (up | diagonal)
+        j[active] = ja - (left | diagonal)
+        length[active] += 1
+    return scores, i, target_end, j, query_end, length
+
+def align_pairs_batch(aligner, pairs, min_length=5, max_sites=1, min_site_score=None):
+    """批量比对多对链，返回与 pairs 一一对应的配对信息列表
+
+    pairs 为 (chain1, chain2, profile1, profile2) 元组列表。max_sites 为 1 时
+    每对最多一个配对，与逐对调用 align_pair 相同；大于 1 时禁用已找到的区域后
+    重新搜索，逐轮找出互不重叠的配对区域，直到区域长度低于 min_length、
+    得分低于 min_site_score 或达到 max_sites 个。两个区域只有在两条链上都
+    重叠时才算重叠，因此同一段序列可以与另一条链上的多个重复位点分别配对；
+    与已报告区域重叠的次优比对不报告，但同样禁用后继续搜索。
+    每对链最多搜索 2 * max_sites 轮，避免长重复序列的运行时间失控。
+    """
+    targets = [pair[2].rc_codes for pair in pairs]
+    queries = [pair[3].codes for pair in pairs]
+    results = [[] for _ in pairs]
+    found = [[] for _ in pairs]
+    active = list(range(len(pairs)))
+    for _ in range(max_sites if max_sites == 1 else 2 * max_sites):
+        if not active:
+            break
+        scores, target_start, target_end, query_start, query_end, length = smith_waterman_batch(
+            [targets[k] for k in active], [queries[k] for k in active],
+            int(aligner.match_score), int(aligner.mismatch_score), int(aligner.open_gap_score),
+            forbidden=[[region[:4] for region in found[k]] for k in active] if found[active[0]] else None)
+        next_active = []
+        for row, k in enumerate(active):
+            score = float(scores[row])
+            if score <= 0 or length[row] < min_length:
+                continue
+            if min_site_score is not None and score < min_site_score:
+                continue
+            ts, te = int(target_start[row]), int(target_end[row])
+            qs, qe = int(query_start[row]), int(query_end[row])
+            reported = not any(ts < r_te and r_ts < te and qs < r_qe and r_qs < qe
+                               for r_ts, r_te, r_qs, r_qe, r_reported in found[k] if r_reported)
+            if reported:
+                results[k].append(build_pairing(*pairs[k], ts, te, qs, qe, score))
+            # 禁用已找到的区域，下一轮在其余区域中搜索
+            found[k].append((ts, te, qs, qe, reported))
+            if len(results[k]) < max_sites:
+                next_active.append(k)
+        active = next_active
+    return results
+
+def iter_pair_indices(n):
+    """按行优先顺序生成所有链对的下标 (i, j)，i < j"""
+    for i in range(n):
+        for j in range(i + 1, n):
+            yield i, j
+
+def iter_kmers(seq, k):
+    """生成序列中所有长度为 k 的子串"""
+    return (seq[i:i + k] for i in range(len(seq) - k + 1))
+
+class KmerIndex:
+    """所有链的 k-mer 种子索引，用于跳过不可能达到最小配对长度的链对
+
+    链 i 与链 j 的比对是 reverse_complement(seq_i) 对 seq_j，二者存在共同 k-mer
+    （即互补种子）时才可能出现长度不小于 k 的连续互补区域。
+    """
+
+    def __init__(self, seqs, k):
+        self.k = k
+        self.index = {}  # k-mer -> 含有该 k-mer 的链下标（升序）
+        for idx, seq in enumerate(seqs):
+            for kmer in set(iter_kmers(seq, k)):
+                self.index.setdefault(kmer, []).append(idx)
+
+    def partners(self, rc_seq, i):
+        """返回与链 i（反向互补序列为 rc_seq）共享互补种子、且下标大于 i 的链，升序"""
+        found = set()
+        for kmer in set(iter_kmers(rc_seq, self.k)):
+            indices = self.index.get(kmer)
+            if indices:
+                found.update(indices[bisect.bisect_right(indices, i):])
+        return sorted(found)
+
+    def seed_runs(self, rc_seq, i):
+        """返回 {链 j: rc_seq 中连续出现互补种子的最长位置数}，只含下标大于 i 的链
+
+        长度为 L 的连续互补区域在 rc_seq 中贡献 L - k + 1 个连续的种子位置，
+        因此最长连续位置数加 k - 1 是该链对连续互补区域长度的上界。
+        """
+        runs, longest = {}, {}
+        for pos, kmer in enumerate(iter_kmers(rc_seq, self.k)):
+            indices = self.index.get(kmer)
+            if not indices:
+                continue
+            for j in indices[bisect.bisect_right(indices, i):]:
+                start, last = runs.get(j, (pos, pos))
+                if last != pos - 1:
+                    start = pos
+                runs[j] = (start, pos)
+                longest[j] = max(longest.get(j, 0), pos - start + 1)
+        return longest
+
+def iter_seeded_pair_indices(profiles, k, stats=None):
+    """按行优先顺序生成共享互补种子的链对下标，并统计被跳过的链对数"""
+    index = KmerIndex([profile.seq for profile in profiles], k)
+    candidates = 0
+    for i, profile in enumerate(profiles):
+        for j in index.partners(profile.rc_seq, i):
+            candidates += 1
+            yield i, j
+    if stats is not None:
+        total = len(profiles) * (len(profiles) - 1) // 2
+        stats['pairs_pruned'] = stats.get('pairs_pruned', 0) + total - candidates
+
+def score_bound(matches, runs, match_score, penalty):
+    """匹配列不超过 matches 个、每段连续匹配不超过 runs 个时局部比对的最高可能得分（数组）
+
+    相邻两段连续匹配之间至少隔一个错配或空位列，每列罚分不少于 penalty。M 个匹配至少
+    分成 ceil(M / r) 段，得分不超过 match_score * M - penalty * (ceil(M / r) - 1)。
+    该式在 M 取 r（只有一段）、不超过 matches 的 r 的最大倍数或 matches 时取到最大值：
+    罚分较高时（如严格模式）上界即为 match_score * r。runs 为 None 时只按匹配数计算。
+    """
+    if runs is None:
+        return match_score * matches
+    runs = np.maximum(np.minimum(runs, matches), 1)
+    whole = runs * (matches // runs)
+    return np.maximum.reduce([
+        match_score * np.minimum(runs, matches),
+        match_score * whole - penalty * np.maximum(whole // runs - 1, 0),
+        match_score * matches - penalty * np.maximum(-(-matches // runs) - 1, 0),
+    ])
+
+def iter_pair_bounds(profiles, aligner, seed_k=None, stats=None):
+    """按行优先顺序逐行生成候选链对的比对得分上界 (i, 链 j 的下标数组, 上界数组)
+
+    比对中每个匹配列都把链1反向互补序列中的一个碱基与链2中相同的碱基配对，因此匹配数
+    不超过 Σ_b min(count_b(rc(seq1)), count_b(seq2))（碱基组成上界，不超过两链长度的
+    较小者）。启用种子预筛选时，KmerIndex.seed_runs 还给出连续互补区域长度的上界，
+    见 score_bound；严格模式下上界即为该长度，与 align_pair_strict 一致。不共享种子的
+    链对与 iter_seeded_pair_indices 一样跳过。
+    """
+    match = aligner.match_score
+    penalty = min(-aligner.mismatch_score, -aligner.open_gap_score)
+    counts = np.array([np.bincount(profile.codes, minlength=4) for profile in profiles],
+                      dtype=np.int64).reshape(-1, 4)
+    index = KmerIndex([profile.seq for profile in profiles], seed_k) if seed_k else None
+    candidates = 0
+    for i, profile in enumerate(profiles):
+        runs = None
+        if index is None:
+            cols = np.arange(i + 1, len(profiles), dtype=np.int64)
+        else:
+            partners = sorted(index.seed_runs(profile.rc_seq, i).items())
+            cols = np.array([j for j, _ in partners], dtype=np.int64)
+            runs = np.array([run for _, run in partners], dtype=np.int64) + seed_k - 1
+        candidates += len(cols)
+        # 反向互补序列中碱基 b 的个数即链1中互补碱基 3 - b 的个数
+        matches = np.minimum(counts[i, ::-1], counts[cols]).sum(axis=1)
+        yield i, cols, score_bound(matches, runs, match, penalty)
+    if stats is not None and index is not None:
+        total = len(profiles) * (len(profiles) - 1) // 2
+        stats['pairs_pruned'] = stats.get('pairs_pruned', 0) + total - candidates
+
+class PairingSelector:
+    """用有界最小堆保留得分最高的 top_k 个配对，并可要求最低得分 min_score
+
+    得分相同时保留链对下标较小者，结果与比对全部链对后排序截取一致。
+    top_k 为 None 时只按 min_score 筛选。
+    """
+
+    def __init__(self, top_k=None, min_score=None):
+        self.top_k = top_k
+        self.min_score = min_score
+        self.heap = []  # (得分, -i, -j, -位点序号, 配对信息)，堆顶为当前第 K 名
+
+    def threshold(self):
+        """返回进入结果所需的最低得分，得分上界低于该值的链对无需比对"""
+        threshold = self.min_score
+        if self.top_k and len(self.heap) >= self.top_k:
+            kth_score = self.heap[0][0]
+            threshold = kth_score if threshold is None else max(threshold, kth_score)
+        return threshold
+
+    def add(self, i, j, pair_sites):
+        """加入链对 (i, j) 的配对区域"""
+        for site, pairing in enumerate(pair_sites):
+            score = pairing[6]
+            if self.min_score is not None and score < self.min_score:
+                continue
+            entry = (score, -i, -j, -site, pairing)
+            if not self.top_k or len(self.heap) < self.top_k:
+                heapq.heappush(self.heap, entry)
+            elif entry > self.heap[0]:
+                heapq.heapreplace(self.heap, entry)
+
+    def pairings(self):
+        """按得分从高到低返回保留的配对信息"""
+        return [entry[-1] for entry in sorted(self.heap, reverse=True)]
+
+def iter_bounded_pair_indices(bounds, selector, stats=None):
+    """按得分上界从高到低生成链对下标，上界低于当前门槛时提前结束
+
+    bounds 为 iter_pair_bounds 的结果。上界低于 selector.min_score 的链对直接跳过，其余
+    链对以紧凑的 NumPy 数组保存后排序；所有上界都相同时（例如不启用种子预筛选、长度与
+    碱基组成都相近的文库）排序无助于提前结束，按行优先顺序生成。
+    """
+    firsts, seconds, values = [], [], []
+    for i, cols, row_bounds in bounds:
+        if selector.min_score is not None:
+            keep = row_bounds >= selector.min_score
+            if stats is not None:
+                stats['pairs_bounded'] += len(cols) - int(np.count_nonzero(keep))
+            cols, row_bounds = cols[keep], row_bounds[keep]
+        firsts.append(np.full(len(cols), i, dtype=np.int32))
+        seconds.append(cols.astype(np.int32))
+        values.append(np.asarray(row_bounds, dtype=np.float64))
+    if not values:
+        return
+    firsts, seconds, values = np.concatenate(firsts), np.concatenate(seconds), np.concatenate(values)
+    if values.size and values.min() < values.max():
+        # 稳定排序：上界相同的链对保持行优先顺序
+        order = np.argsort(-values, kind='stable')
+        firsts, seconds, values = firsts[order], seconds[order], values[order]
+    for position, (bound, i, j) in enumerate(zip(values.tolist(), firsts.tolist(), seconds.tolist())):
+        threshold = selector.threshold()
+        if threshold is not None and bound < threshold:
+            # 其余链对的上界都不超过当前链对，均不可能进入结果
+            if stats is not None:
+                stats['pairs_bounded'] += len(values) - position
+            return
+        yield i, j
+
+def iter_chunks(iterable, size):
+    """将可迭代对象切分为固定大小的块"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+# 工作进程中的全局状态，由 _init_worker 在每个进程中初始化一次
+_worker_state = {}
+
+# 可选的比对引擎：auto 时严格模式使用后缀自动机，宽松模式使用 NumPy 批量比对，
+# 比对参数不受批量内核支持时使用 Biopython
+ENGINES = ('auto', 'biopython', 'suffix', 'numpy')
+
+def resolve_engine(engine, strict, scoring=None, max_sites=1):
+    """根据比对模式（或评分方案）确定实际使用的比对引擎
+
+    max_sites 大于 1 时需要多位点搜索，只能使用 NumPy 批量比对引擎。
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"未知的比对引擎：{engine}，可选：{', '.join(ENGINES)}")
+    if max_sites > 1:
+        if engine not in ('auto', 'numpy'):
+            raise ValueError(f"多位点搜索（--max-sites 大于 1）使用 NumPy 批量比对引擎，不能指定 {engine} 引擎")
+        engine = 'numpy'
+    if engine in ('auto', 'numpy') and not supports_batch_alignment(LazyAligner(strict, scoring)):
+        if engine == 'numpy':
+            raise ValueError("当前比对参数不支持 NumPy 批量比对")
+        return 'suffix' if strict else 'biopython'
+    if engine == 'auto':
+        return 'suffix' if strict else 'numpy'
+    if engine == 'suffix' and not strict:
+        raise ValueError("后缀自动机引擎仅支持严格模式")
+    return engine
+
+def _init_worker(chain_items, strict, engine='biopython', min_length=5, max_sites=1, min_site_score=None,
+                 scoring=None, automata_block=None):
+    """工作进程初始化：每个进程只构建一次比对器（见 LazyAligner，需要时才导入 Biopython）
+
+    chain_items 为 (链名, ChainProfile) 列表，反向互补序列与碱基编码已预先算好。
+    scoring 为 ScoringProfile 时按其得分构建比对器。
+    automata_block 不为 None 时只保留当前列块（j // automata_block）的后缀自动机，
+    供分块筛选使用，避免进程内缓存整个文库的后缀自动机。
+    """
+    _worker_state['chains'] = chain_items
+    _worker_state['min_length'] = min_length
+    _worker_state['max_sites'] = max_sites
+    _worker_state['min_site_score'] = min_site_score
+    _worker_state['aligner'] = LazyAligner(strict, scoring)
+    _worker_state['engine'] = engine
+    # 每条链的后缀自动机只构建一次，在多个链对之间复用
+    _worker_state['automata'] = {}
+    _worker_state['automata_block'] = automata_block
+    _worker_state['automata_column'] = None
+
+def _align_indexed_pair(i, j):
+    """按下标比对一对链，使用当前进程的比对器和引擎"""
+    chain_items = _worker_state['chains']
+    aligner = _worker_state['aligner']
+    chain1, profile1 = chain_items[i]
+    chain2, profile2 = chain_items[j]
+    min_length = _worker_state['min_length']
+    if _worker_state['engine'] != 'suffix':
+        return align_pair(aligner, chain1, chain2, profile1, profile2, min_length)
+
+    automata = _worker_state['automata']
+    block_size = _worker_state['automata_block']
+    if block_size and j // block_size != _worker_state['automata_column']:
+        # 分块筛选按块顺序分发链对，换到新的列块后旧块的后缀自动机不会再用到
+        automata.clear()
+        _worker_state['automata_column'] = j // block_size
+    if j not in automata:
+        automata[j] = SuffixAutomaton(profile2.codes.tobytes())
+    return align_pair_strict(aligner, chain1, chain2, profile1, profile2, automata[j], min_length)
+
+def _align_batched(index_pairs):
+    """用 NumPy 内核批量比对一块链对，过大的链对逐对交给 Biopython（见 align_pair_sites）"""
+    chain_items = _worker_state['chains']
+    aligner = _worker_state['aligner']
+    min_length = _worker_state['min_length']
+    results = [None] * len(index_pairs)
+    batch, slots = [], []
+    max_target = max_query = 0
+
+    def flush():
+        sites = align_pairs_batch(aligner, batch, min_length,
+                                  _worker_state['max_sites'], _worker_state['min_site_score'])
+        for slot, pair_sites in zip(slots, sites):
+            results[slot] = pair_sites
+        batch.clear()
+        slots.clear()
+
+    for slot, (i, j) in enumerate(index_pairs):
+        chain1, profile1 = chain_items[i]
+        chain2, profile2 = chain_items[j]
+        if batch_cells(len(profile1), len(profile2)) > MAX_BATCH_CELLS:
+            results[slot] = align_pair_sites(aligner, chain1, chain2, profile1, profile2, min_length,
+                                             _worker_state['max_sites'], _worker_state['min_site_score'])
+            continue
+        # 整批填充到最长序列，超过单元数上限时先比对已有的一批
+        target = max(max_target, len(profile1))
+        query = max(max_query, len(profile2))
+        if batch and (len(batch) + 1) * batch_cells(target, query) > MAX_BATCH_CELLS:
+            flush()
+            target, query = len(profile1), len(profile2)
+        max_target, max_query = target, query
+        batch.append((chain1, chain2, profile1, profile2))
+        slots.append(slot)
+    if batch:
+        flush()
+    return results
+
+def _align_chunk_results(index_pairs):
+    """在工作进程中比对一块链对，返回与输入一一对应的配对信息列表（无有效配对为空列表）"""
+    if _worker_state['engine'] == 'numpy':
+        return _align_batched(index_pairs)
+    results = []
+    for i, j in index_pairs:
+        pairing = _align_indexed_pair(i, j)
+        results.append([] if pairing is None else [pairing])
+    return results
+
+def _init_profile_worker(chain_items, settings, max_sites=1, min_site_score=None):
+    """多评分方案的工作进程初始化：各方案共用链与后缀自动机，各自构建比对器
+
+    settings 为每个方案的 (ScoringProfile, 引擎, 最小配对长度)。
+    """
+    _worker_state.pop('profiles', None)
+    automata = {}
+    states = []
+    for scoring, engine, min_length in settings:
+        _init_worker(chain_items, scoring_is_strict(scoring), engine, min_length, max_sites, min_site_score,
+                     scoring)
+        _worker_state['automata'] = automata
+        states.append(dict(_worker_state))
+    _worker_state['profiles'] = states
+
+def _align_profiles_chunk(index_pairs):
+    """按每个评分方案比对同一块链对，返回各方案的配对信息列表（顺序与 settings 相同）"""
+    results = []
+    for state in _worker_state['profiles']:
+        _worker_state.update(state)
+        results.append(_align_chunk_results(index_pairs))
+    return results
+
+def _map_chunks(func, chunks, workers, initargs, initializer=_init_worker):
+    """在当前进程或进程池中逐块执行 func，按输入顺序生成结果"""
+    if workers == 1:
+        initializer(*initargs)
+        yield from map(func, chunks)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer,
+                             initargs=initargs) as executor:
+        # 按提交顺序返回结果，保证与串行结果顺序一致；同时在途的块数有限，
+        # chunks 按需读取，生成块时可以参考已返回的结果（见 iter_bounded_pair_indices）
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def resolve_seed_k(seed_k, strict, min_length):
+    """确定种子预筛选的 k 值，返回 None 表示不预筛选
+
+    默认（seed_k 为 None）时严格模式取 k = min_length：严格模式的配对区域是
+    连续互补序列，必然包含长度为 k 的互补种子，因此预筛选不会漏掉任何配对。
+    宽松模式的配对区域可含错配，预筛选可能漏掉配对，只在显式指定 k 时启用。
+    """
+    if seed_k is None:
+        seed_k = min_length if strict else 0
+    if seed_k <= 0:
+        return None
+    if strict and seed_k > min_length:
+        raise ValueError(f"严格模式下种子长度 k={seed_k} 不能大于最小配对长度 {min_length}")
+    return seed_k
+
+class AlignmentCache:
+    """持久化的比对结果缓存（SQLite），用于修改少数序列后的增量重新筛选
+
+    键为规范化后的序列对与比对参数的哈希，值为配对区域（不含链名）列表；
+    无有效配对的链对同样缓存。条目数超过 max_entries 时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, path, aligner, min_length=5, max_entries=1_000_000, max_sites=1, min_site_score=None):
+        import sqlite3
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.max_entries = max_entries
+        self.params = (f"{aligner.mode}:{aligner.match_score}:{aligner.mismatch_score}:"
+                       f"{aligner.open_gap_score}:{aligner.extend_gap_score}:{min_length}:"
+                       f"sites={max_sites}:{min_site_score}")
+        with self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS alignments "
+                "(key BLOB PRIMARY KEY, region TEXT NOT NULL, last_used REAL NOT NULL)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS alignments_last_used ON alignments (last_used)")
+        self.count = self.connection.execute("SELECT COUNT(*) FROM alignments").fetchone()[0]
+
+    @classmethod
+    def in_directory(cls, cache_dir, strict, min_length=5, max_entries=1_000_000, max_sites=1,
+                     min_site_score=None):
+        """在缓存目录中打开当前模式的缓存"""
+        return cls(os.path.join(cache_dir, 'alignments.sqlite'), LazyAligner(strict=strict),
+                   min_length, max_entries, max_sites, min_site_score)
+
+    def key(self, seq1, seq2):
+        """计算序列对与比对参数的缓存键"""
+        text = f"{self.params}\0{seq1.strip().upper()}\0{seq2.strip().upper()}"
+        return hashlib.sha1(text.encode('utf-8')).digest()
+
+    def get_many(self, keys):
+        """批量查询缓存，返回 {键: 配对区域列表}，并更新命中条目的使用时间"""
+        found = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.connection.execute(
+                f"SELECT key, region FROM alignments WHERE key IN ({placeholders})", batch)
+            for key, region in rows:
+                found[key] = [tuple(site) for site in json.loads(region)]
+        if found:
+            with self.connection:
+                self.connection.executemany("UPDATE alignments SET last_used = ? WHERE key = ?",
+                                            [(time.time(), key) for key in found])
+        return found
+
+    def put_many(self, entries):
+        """批量写入 (键, 配对区域列表)，必要时淘汰最久未使用的条目"""
+        if not entries:
+            return
+        now = time.time()
+        rows = [(key, json.dumps(regions), now) for key, regions in entries]
+        with self.connection:
+            before = self.connection.total_changes
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO alignments (key, region, last_used) VALUES (?, ?, ?)", rows)
+            self.count += self.connection.total_changes - before
+            if self.count > self.max_entries:
+                # 一次淘汰到上限的 90%，避免每块都触发淘汰
+                excess = self.count - int(self.max_entries * 0.9)
+                self.connection.execute(
+                    "DELETE FROM alignments WHERE key IN "
+                    "(SELECT key FROM alignments ORDER BY last_used LIMIT ?)", (excess,))
+                self.count -= excess
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _region_of(pairing):
+    """提取配对信息中不含链名的配对区域，用于缓存"""
+    c1_start, c1_end, c2_start, c2_end, score, gc_pairs = pairing[2:]
+    return (int(c1_start), int(c1_end), int(c2_start), int(c2_end), float(score), int(gc_pairs))
+
+def _iter_chunk_results(chunks, workers, initargs, func=_align_chunk_results, initializer=_init_worker):
+    """逐块比对，生成 (链对下标块, 与之一一对应的配对信息列表)"""
+    submitted = collections.deque()
+
+    def track(chunks):
+        for chunk in chunks:
+            submitted.append(chunk)
+            yield chunk
+
+    for pair_results in _map_chunks(func, track(chunks), workers, initargs, initializer):
+        yield submitted.popleft(), pair_results
+
+def _iter_cached_chunk_results(chain_items, chunks, cache, workers, initargs, stats):
+    """与 _iter_chunk_results 相同，但先查询缓存，只比对未命中的链对，并将新结果写回缓存"""
+    lookups = collections.deque()
+
+    def miss_chunks():
+        for chunk in chunks:
+            keys = [cache.key(chain_items[i][1].seq, chain_items[j][1].seq) for i, j in chunk]
+            found = cache.get_many(keys)
+            lookups.append((chunk, keys, found))
+            if stats is not None:
+                stats['cache_hits'] += len(found)
+                stats['cache_misses'] += len(chunk) - len(found)
+            yield [pair for pair, key in zip(chunk, keys) if key not in found]
+
+    for computed in _map_chunks(_align_chunk_results, miss_chunks(), workers, initargs):
+        chunk, keys, found = lookups.popleft()
+        computed = iter(computed)
+        pair_results, new_entries = [], []
+        for (i, j), key in zip(chunk, keys):
+            if key in found:
+                pair_sites = [(chain_items[i][0], chain_items[j][0], *region) for region in found[key]]
+            else:
+                pair_sites = next(computed)
+                new_entries.append((key, [_region_of(pairing) for pairing in pair_sites]))
+            pair_results.append(pair_sites)
+        cache.put_many(new_entries)
+        yield chunk, pair_results
+
+def _prepare_screen(chains, mode, engine, min_length, seed_k, max_sites, min_site_score):
+    """构建每条链的预处理结果与工作进程参数，返回 (chain_items, strict, seed_k, initargs)"""
+    # 每条链的反向互补序列、碱基编码与 GC 前缀和只计算一次，供预筛选与各比对引擎复用
+    chain_items = list(zip(chains, build_chain_profiles(chains)))
+    strict = mode == 'strict'
+    engine = resolve_engine(engine, strict, max_sites=max_sites)
+    seed_k = resolve_seed_k(seed_k, strict, min_length)
+    initargs = (chain_items, strict, engine, min_length, max_sites, min_site_score)
+    return chain_items, strict, seed_k, initargs
+
+def find_pairings(chains, mode, workers=1, chunk_size=256, engine='auto',
+                  min_length=5, seed_k=None, stats=None, cache=None, max_sites=1, min_site_score=None,
+                  top_k=None, min_score=None):
+    """比对所有链对，返回配对信息列表
+
+    workers 为 1 时串行比对；大于 1 时将链对分块分发到进程池，
+    workers 为 None 或 0 时使用全部 CPU 核心。结果顺序与串行比对一致。
+    engine 选择比对引擎，见 ENGINES。min_length 为最小配对长度，
+    seed_k 为 k-mer 种子预筛选的 k 值，见 resolve_seed_k。
+    stats 为字典时写入统计信息（链对总数、跳过数、缓存命中数等）。
+    cache 为 AlignmentCache 时从缓存读取未修改链对的结果，只比对其余链对。
+    max_sites 大于 1 时每对链最多报告 max_sites 个互不重叠的配对区域，
+    见 align_pairs_batch；多位点搜索使用 NumPy 批量比对引擎（engine 须为 auto 或 numpy）。
+    top_k 或 min_score 不为 None 时只保留得分最高的 top_k 个配对 / 得分不低于
+    min_score 的配对，按得分从高到低返回；链对按得分上界从高到低比对，上界不可能
+    进入结果的链对直接跳过，见 iter_pair_bounds 与 PairingSelector。宽松模式的上界
+    只能由碱基组成估计，长度与组成相近的文库几乎没有链对能够跳过。
+    """
+    chain_items, strict, seed_k, initargs = _prepare_screen(chains, mode, engine, min_length, seed_k,
+                                                             max_sites, min_site_score)
+    if not workers:
+        workers = os.cpu_count() or 1
+
+    if stats is not None:
+        stats['pairs_total'] = len(chain_items) * (len(chain_items) - 1) // 2
+        stats['pairs_pruned'] = 0
+        stats['pairs_bounded'] = 0
+        stats['cache_hits'] = stats['cache_misses'] = 0
+        stats['seed_k'] = seed_k
+    profiles = [profile for _, profile in chain_items]
+    selector = None
+    if top_k or min_score is not None:
+        selector = PairingSelector(top_k, min_score)
+        bounds = iter_pair_bounds(profiles, LazyAligner(strict=strict), seed_k, stats)
+        pair_indices = iter_bounded_pair_indices(bounds, selector, stats)
+    elif seed_k:
+        pair_indices = iter_seeded_pair_indices(profiles, seed_k, stats)
+    else:
+        pair_indices = iter_pair_indices(len(chain_items))
+    chunks = iter_chunks(pair_indices, chunk_size)
+
+    if cache is not None:
+        results = _iter_cached_chunk_results(chain_items, chunks, cache, workers, initargs, stats)
+    else:
+        results = _iter_chunk_results(chunks, workers, initargs)
+    if selector is None:
+        return [pairing for _, pair_results in results for pair_sites in pair_results for pairing in pair_sites]
+    for chunk, pair_results in results:
+        for (i, j), pair_sites in zip(chunk, pair_results):
+            selector.add(i, j, pair_sites)
+    return selector.pairings()
+
+def find_profile_pairings(chains, scorings, workers=1, chunk_size=256, engine='auto', min_length=5, seed_k=None,
+                          stats=None, max_sites=1, min_site_score=None):
+    """在一次运行中按多个评分方案比对所有链对，返回 {方案名: 配对信息列表}
+
+    各方案共用链的预处理结果、链对枚举（含种子预筛选）与进程池：每块链对在工作进程中
+    依次按各方案比对。每个方案的结果与单独用该方案运行 find_pairings 相同。其余参数
+    与 find_pairings 相同，ScoringProfile.min_length 为 None 时使用 min_length。
+    """
+    names = [scoring.name for scoring in scorings]
+    if len(set(names)) != len(names):
+        raise ValueError(f"评分方案名重复：{', '.join(names)}")
+    chain_items = list(zip(chains, build_chain_profiles(chains)))
+    if not workers:
+        workers = os.cpu_count() or 1
+    settings, seed_ks = [], []
+    for scoring in scorings:
+        strict = scoring_is_strict(scoring)
+        length = min_length if scoring.min_length is None else scoring.min_length
+        settings.append((scoring, resolve_engine(engine, strict, scoring, max_sites), length))
+        seed_ks.append(resolve_seed_k(seed_k, strict, length))
+    # 任一方案不预筛选时比对全部链对；否则取最小的 k，共享长度为 k 的种子是其余方案种子的必要条件
+    shared_k = None if None in seed_ks else min(seed_ks)
+
+    profiles = [profile for _, profile in chain_items]
+    if stats is not None:
+        stats['pairs_total'] = len(chain_items) * (len(chain_items) - 1) // 2
+        stats['pairs_pruned'] = 0
+        stats['seed_k'] = shared_k
+    if shared_k:
+        pair_indices = iter_seeded_pair_indices(profiles, shared_k, stats)
+    else:
+        pair_indices = iter_pair_indices(len(chain_items))
+    results = {scoring.name: [] for scoring in scorings}
+    for _, profile_results in _iter_chunk_results(iter_chunks(pair_indices, chunk_size), workers,
+                                                  (chain_items, settings, max_sites, min_site_score),
+                                                  _align_profiles_chunk, _init_profile_worker):
+        for scoring, pair_results in zip(scorings, profile_results):
+            results[scoring.name].extend(pairing for pair_sites in pair_results for pairing in pair_sites)
+    return results
+
+# 分块筛选结果的列（列名, 数据类型），链以下标表示，链名保存在 chains.txt
+RESULT_COLUMNS = (
+    ('chain1', '<i4'), ('chain2', '<i4'),
+    ('chain1_start', '<i4'), ('chain1_end', '<i4'),
+    ('chain2_start', '<i4'), ('chain2_end', '<i4'),
+    ('score', '<f8'), ('gc_pairs', '<i4'),
+)
+
+class TiledResultStore:
+    """分块筛选结果的磁盘列式存储
+
+    每列是一个只追加的二进制文件（<列名>.col），可用 load_tiled_results 以
+    内存映射方式读取。checkpoint.json 记录已完成的分块与行数，每块结果写入
+    磁盘后才更新；重新打开时截掉上次中断时写了一半的行，并跳过已完成的分块。
+    fingerprint 记录序列与筛选参数，参数不同的结果不能续算。
+    """
+
+    def __init__(self, directory, fingerprint, names):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self.checkpoint_path = os.path.join(directory, 'checkpoint.json')
+        self.tiles_done = set()
+        self.rows = 0
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            if checkpoint['fingerprint'] != fingerprint:
+                raise ValueError(f"{directory} 中已有不同序列或参数的筛选结果，请换一个目录或先删除它")
+            self.tiles_done = {tuple(tile) for tile in checkpoint['tiles_done']}
+            self.rows = checkpoint['rows']
+        else:
+            with open(os.path.join(directory, 'chains.txt'), 'w', encoding='utf-8') as f:
+                f.writelines(f"{name}\n" for name in names)
+        for name, dtype in RESULT_COLUMNS:
+            with open(self._column_path(name), 'ab') as f:
+                f.truncate(self.rows * np.dtype(dtype).itemsize)
+
+    def _column_path(self, name):
+        return os.path.join(self.directory, f"{name}.col")
+
+    def append_tile(self, tile, columns):
+        """追加一个分块的结果（{列名: 数组}），写入磁盘后再记录断点"""
+        for name, dtype in RESULT_COLUMNS:
+            with open(self._column_path(name), 'ab') as f:
+                np.asarray(columns[name], dtype=dtype).tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+        self.rows += len(columns['score'])
+        self.tiles_done.add(tile)
+        # 先写临时文件再替换，中断时断点文件不会损坏
+        temp_path = self.checkpoint_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': self.fingerprint, 'rows': self.rows,
+                       'tiles_done': sorted(self.tiles_done)}, f)
+        os.replace(temp_path, self.checkpoint_path)
+
+def load_tiled_results(directory):
+    """读取分块筛选结果，返回 (链名列表, {列名: 数组})；只包含断点中记录的行"""
+    with open(os.path.join(directory, 'chains.txt'), encoding='utf-8') as f:
+        names = f.read().splitlines()
+    rows = 0
+    checkpoint_path = os.path.join(directory, 'checkpoint.json')
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path, encoding='utf-8') as f:
+            rows = json.load(f)['rows']
+    columns = {}
+    for name, dtype in RESULT_COLUMNS:
+        path = os.path.join(directory, f"{name}.col")
+        # 空文件不能内存映射
+        columns[name] = np.memmap(path, dtype=dtype, mode='r', shape=(rows,)) if rows else np.empty(0, dtype)
+    return names, columns
+
+def pairings_to_columns(names, pairings):
+    """将配对信息转换为与 RESULT_COLUMNS 对应的列，链以 names 中的下标表示"""
+    index = {name: i for i, name in enumerate(names)}
+    rows = [(index[pairing[0]], index[pairing[1]], *pairing[2:]) for pairing in pairings]
+    return {name: np.array([row[k] for row in rows], dtype=dtype)
+            for k, (name, dtype) in enumerate(RESULT_COLUMNS)}
+
+# 可选的稳定性列（见 nearest_neighbor_stability），存在时附加在导出结果的末尾
+STABILITY_COLUMNS = (('dg37', '<f8'), ('tm', '<f8'))
+
+def export_columns(columns):
+    """返回要导出的列：RESULT_COLUMNS 加上 columns 中已有的稳定性列"""
+    return RESULT_COLUMNS + tuple(column for column in STABILITY_COLUMNS if column[0] in columns)
+
+def columns_to_array(names, columns):
+    """将结果列转换为 NumPy 结构化数组，链下标替换为链名"""
+    names = np.array(names, dtype=str)
+    dtype = [('chain1', names.dtype), ('chain2', names.dtype)] + list(export_columns(columns)[2:])
+    array = np.empty(len(columns['score']), dtype=dtype)
+    for name, _ in export_columns(columns):
+        array[name] = names[columns[name]] if name in ('chain1', 'chain2') else columns[name]
+    return array
+
+# 结果导出格式（按文件扩展名选择）；Parquet 需要安装 pyarrow
+EXPORT_FORMATS = ('.csv', '.npy', '.parquet')
+
+def export_results(filename, names, columns, block_size=100_000):
+    """按扩展名将结果列导出为 CSV、NumPy 结构化数组（.npy）或 Parquet，返回导出的行数
+
+    CSV 分块写出，可直接导出 load_tiled_results 内存映射的大规模结果。
+    """
+    rows = len(columns['score'])
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.npy':
+        np.save(filename, columns_to_array(names, columns))
+    elif extension == '.csv':
+        import csv
+
+        with open(filename, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([name for name, _ in export_columns(columns)])
+            for start in range(0, rows, block_size):
+                block = columns_to_array(names, {name: columns[name][start:start + block_size]
+                                                 for name, _ in export_columns(columns)})
+                writer.writerows(block.tolist())
+    elif extension == '.parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("导出 Parquet 需要安装 pyarrow（pip install pyarrow），或改用 .csv/.npy") from None
+        # 链名按字典编码存储，每行只保存下标
+        dictionary = pa.array(names, type=pa.string())
+        table = pa.table({
+            name: (pa.DictionaryArray.from_arrays(pa.array(columns[name], type=pa.int32()), dictionary)
+                   if name in ('chain1', 'chain2') else pa.array(np.asarray(columns[name], dtype=dtype)))
+            for name, dtype in export_columns(columns)
+        })
+        pq.write_table(table, filename)
+    else:
+        raise ValueError(f"不支持的导出格式：{filename}，可选：{', '.join(EXPORT_FORMATS)}")
+    return rows
+
+# SantaLucia 与 Hicks (2004) 统一最近邻参数（1 M Na+）：ΔH（kcal/mol）与 ΔS（cal/(K·mol)），
+# 按 5'→3' 的二核苷酸编码 4 * x + y 索引（A=0, C=1, G=2, T=3）。序列按 3'→5' 书写（与报告中链卡片的
+# (3'-5') 标注一致），链1上相邻的两个碱基 top[k], top[k + 1] 对应 5'→3' 的二核苷酸 top[k + 1] top[k]
+NN_ENTHALPY = np.array([-7.6, -8.4, -7.8, -7.2, -8.5, -8.0, -10.6, -7.8,
+                        -8.2, -9.8, -8.0, -8.4, -7.2, -8.2, -8.5, -7.6])
+NN_ENTROPY = np.array([-21.3, -22.4, -21.0, -20.4, -22.7, -19.9, -27.2, -21.0,
+                       -22.2, -24.4, -19.9, -22.4, -21.3, -22.2, -22.7, -21.3])
+NN_INITIATION = (0.2, -5.7)  # 起始 ΔH、ΔS
+NN_TERMINAL_AT = (2.2, 6.9)  # 每个末端 A·T 碱基对的 ΔH、ΔS
+GAS_CONSTANT = 1.987  # cal/(K·mol)
+
+def nearest_neighbor_stability(chains, columns, sodium=1.0, strand_conc=0.25e-6):
+    """按最近邻模型估计每个配对区域的 ΔG37（kcal/mol）与 Tm（°C），返回 {'dg37': 数组, 'tm': 数组}
+
+    chains 为 SequenceStore，columns 为 pairings_to_columns 或 load_tiled_results 的结果列
+    （链下标与 chains 的顺序一致）。所有配对一次向量化计算。错配与空位打断双链：区域中每段
+    连续完全互补的子螺旋各自作为一条双链计算（起始项、末端 A·T 与堆积），报告最稳定的子螺旋，
+    因此含错配或空位的宽松配对不会与等长的完全互补双链得到相同的 ΔG。含空位的区域不保存比对
+    路径，按比对两端各自的对角线（局部比对的两端必为配对碱基）寻找子螺旋。
+    sodium 为 Na+ 浓度（M），strand_conc 为单链总浓度（M）。
+    """
+    count = len(columns['score'])
+    if not count:
+        return {'dg37': np.zeros(0), 'tm': np.zeros(0)}
+    chain1 = np.asarray(columns['chain1'], dtype=np.int64)
+    chain2 = np.asarray(columns['chain2'], dtype=np.int64)
+    c1_start = np.asarray(columns['chain1_start'], dtype=np.int64)
+    c2_start = np.asarray(columns['chain2_start'], dtype=np.int64)
+    c2_end = np.asarray(columns['chain2_end'], dtype=np.int64)
+    lengths = np.asarray(columns['chain1_end'], dtype=np.int64) - c1_start + 1
+
+    # 每个区域沿右端对角线比较一次（链1 第 t 个碱基对应链2 的 c2_end - t）；含空位的区域再沿
+    # 左端对角线比较一次（对应链2 的 c2_start + 长度 - 1 - t）
+    gapped = np.flatnonzero(c2_end - c2_start + 1 != lengths)
+    regions = np.concatenate((np.arange(count), gapped))
+    anchors = np.concatenate((c2_end, c2_start[gapped] + lengths[gapped] - 1))
+    sizes = lengths[regions]
+    rows = np.repeat(np.arange(len(regions)), sizes)
+    offsets = np.arange(len(rows)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    top = chains.gather(chain1[regions], c1_start[regions], sizes)
+    positions = np.repeat(anchors, sizes) - offsets
+    inside = (positions >= np.repeat(c2_start[regions], sizes)) & (positions <= np.repeat(c2_end[regions], sizes))
+    matched = np.zeros(len(rows), dtype=bool)
+    matched[inside] = top[inside] == 3 - chains.take(np.repeat(chain2[regions], sizes)[inside], positions[inside])
+
+    # 连续配对的碱基组成子螺旋；同一子螺旋内相邻的两个碱基构成一个堆积
+    starts = matched & np.concatenate(([True], ~matched[:-1] | (rows[1:] != rows[:-1])))
+    helix = np.cumsum(starts) - 1
+    ends = matched & np.concatenate((~matched[1:] | (rows[1:] != rows[:-1]), [True]))
+    helices = int(starts.sum())
+    if not helices:
+        return {'dg37': np.full(count, np.nan), 'tm': np.full(count, np.nan)}
+    stacks = np.flatnonzero(matched[:-1] & ~ends[:-1])
+    dinucleotides = 4 * top[stacks + 1] + top[stacks]
+    enthalpy = np.bincount(helix[stacks], weights=NN_ENTHALPY[dinucleotides], minlength=helices)
+    entropy = np.bincount(helix[stacks], weights=NN_ENTROPY[dinucleotides], minlength=helices)
+
+    # 起始项与末端 A·T 罚分
+    terminal_at = (np.isin(top[starts], (0, 3)).astype(np.int64) + np.isin(top[ends], (0, 3)))
+    enthalpy += NN_INITIATION[0] + NN_TERMINAL_AT[0] * terminal_at
+    entropy += NN_INITIATION[1] + NN_TERMINAL_AT[1] * terminal_at
+    # 盐浓度校正（SantaLucia 1998）
+    entropy += 0.368 * (np.flatnonzero(ends) - np.flatnonzero(starts)) * np.log(sodium)
+
+    helix_dg = enthalpy - 310.15 * entropy / 1000
+    helix_tm = 1000 * enthalpy / (entropy + GAS_CONSTANT * np.log(strand_conc / 4)) - 273.15
+    # 每个区域取 ΔG 最低的子螺旋
+    helix_region = regions[rows[starts]]
+    order = np.lexsort((helix_dg, helix_region))
+    best = order[np.concatenate(([True], helix_region[order][1:] != helix_region[order][:-1]))]
+    dg37, tm = np.full(count, np.nan), np.full(count, np.nan)
+    dg37[helix_region[best]] = helix_dg[best]
+    tm[helix_region[best]] = helix_tm[best]
+    return {'dg37': dg37, 'tm': tm}
+
+def best_score_matrix(n, columns, size=512, block_size=1_000_000):
+    """汇总每个链对的最高得分，按链下标降采样为不超过 size × size 的对称矩阵，每格取最大值"""
+    bins = max(1, min(n, size))
+    matrix = np.zeros((bins, bins), dtype=np.float32)
+    for start in range(0, len(columns['score']), block_size):
+        rows = np.asarray(columns['chain1'][start:start + block_size], dtype=np.int64) * bins // n
+        cols = np.asarray(columns['chain2'][start:start + block_size], dtype=np.int64) * bins // n
+        scores = np.asarray(columns['score'][start:start + block_size], dtype=np.float32)
+        np.maximum.at(matrix, (rows, cols), scores)
+        np.maximum.at(matrix, (cols, rows), scores)
+    return matrix
+
+def iter_tiles(n, tile_size):
+    """按行优先顺序生成链对矩阵上三角的分块 (行块, 列块)，行块不大于列块"""
+    blocks = (n + tile_size - 1) // tile_size
+    for row_block in range(blocks):
+        for col_block in range(row_block, blocks):
+            yield row_block, col_block
+
+def iter_tile_pair_indices(profiles, rows, cols, index=None, band_partners=None):
+    """生成分块内的链对下标 (i, j)，i < j；index 为 KmerIndex 时只生成共享互补种子的链对
+
+    band_partners 为同一行块的各列块共用的 {i: 伙伴链下标数组}：行块中每条链的伙伴只查询一次。
+    """
+    if band_partners is None:
+        band_partners = {}
+    for i in rows:
+        if index is None:
+            yield from ((i, j) for j in range(max(i + 1, cols.start), cols.stop))
+            continue
+        partners = band_partners.get(i)
+        if partners is None:
+            partners = band_partners[i] = np.array(index.partners(profiles[i].rc_seq, i), dtype=np.int32)
+        start, stop = np.searchsorted(partners, (cols.start, cols.stop)).tolist()
+        yield from ((i, j) for j in partners[start:stop].tolist())
+
+def screen_fingerprint(chain_items, mode, min_length, seed_k, max_sites, min_site_score, tile_size):
+    """计算序列与筛选参数的指纹，用于判断断点能否续算"""
+    digest = hashlib.sha1(f"{mode}:{min_length}:{seed_k}:{max_sites}:{min_site_score}:{tile_size}".encode())
+    for name, profile in chain_items:
+        digest.update(f"\0{name}\0{profile.seq}".encode('utf-8'))
+    return digest.hexdigest()
+
+def screen_tiled(chains, mode, output_dir, tile_size=1000, workers=1, chunk_size=256, engine='auto',
+                 min_length=5, seed_k=None, stats=None, cache=None, max_sites=1, min_site_score=None,
+                 progress=None):
+    """分块比对所有链对，结果追加到 output_dir 中的列式存储，返回结果总行数
+
+    链对矩阵按 tile_size × tile_size 分块，逐块比对，每块完成后写入磁盘并记录
+    断点，内存中最多只有一块的结果；中断后用相同参数再次运行即可从断点继续。
+    progress 不为 None 时每完成一块调用 progress(已完成块数, 总块数, 累计行数)。
+    其余参数与 find_pairings 相同，所有分块共用一个进程池。
+    """
+    chain_items, strict, seed_k, initargs = _prepare_screen(chains, mode, engine, min_length, seed_k,
+                                                             max_sites, min_site_score)
+    # 工作进程只保留当前列块的后缀自动机（scoring 参数保持默认）
+    initargs = (*initargs, None, tile_size)
+    if not workers:
+        workers = os.cpu_count() or 1
+    store = TiledResultStore(output_dir, screen_fingerprint(chain_items, mode, min_length, seed_k, max_sites,
+                                                            min_site_score, tile_size),
+                             [name for name, _ in chain_items])
+    profiles = [profile for _, profile in chain_items]
+    index = KmerIndex([profile.seq for profile in profiles], seed_k) if seed_k else None
+    tiles = list(iter_tiles(len(chain_items), tile_size))
+    if stats is not None:
+        stats.update(pairs_total=0, pairs_pruned=0, cache_hits=0, cache_misses=0, seed_k=seed_k,
+                     tiles_total=len(tiles), tiles_resumed=len(store.tiles_done))
+
+    finished = collections.deque()
+
+    def iter_tile_chunks():
+        # 分块按行优先顺序处理，同一行块的伙伴链只查询一次，换行块时丢弃
+        band, band_partners = None, {}
+        for tile in tiles:
+            if tile in store.tiles_done:
+                continue
+            if tile[0] != band:
+                band, band_partners = tile[0], {}
+            rows = range(tile[0] * tile_size, min((tile[0] + 1) * tile_size, len(chain_items)))
+            cols = range(tile[1] * tile_size, min((tile[1] + 1) * tile_size, len(chain_items)))
+            candidates = 0
+            for chunk in iter_chunks(iter_tile_pair_indices(profiles, rows, cols, index, band_partners),
+                                     chunk_size):
+                candidates += len(chunk)
+                yield chunk
+            if stats is not None:
+                total = len(rows) * (len(rows) - 1) // 2 if tile[0] == tile[1] else len(rows) * len(cols)
+                stats['pairs_total'] += total
+                stats['pairs_pruned'] += total - candidates
+            # 空块标记分块结束
+            finished.append(tile)
+            yield []
+
+    if cache is not None:
+        results = _iter_cached_chunk_results(chain_items, iter_tile_chunks(), cache, workers, initargs, stats)
+    else:
+        results = _iter_chunk_results(iter_tile_chunks(), workers, initargs)
+    columns = {name: [] for name, _ in RESULT_COLUMNS}
+    for chunk, pair_results in results:
+        if not chunk:
+            store.append_tile(finished.popleft(), columns)
+            if progress is not None:
+                progress(len(store.tiles_done), len(tiles), store.rows)
+            columns = {name: [] for name, _ in RESULT_COLUMNS}
+            continue
+        for (i, j), pair_sites in zip(chunk, pair_results):
+            for pairing in pair_sites:
+                for (name, _), value in zip(RESULT_COLUMNS, (i, j, *pairing[2:])):
+                    columns[name].append(value)
+    return store.rows
+
+def _cpu_time():
+    """当前进程与已结束的子进程（如进程池中的工作进程）消耗的 CPU 时间（秒）"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def peak_memory_bytes():
+    """返回 {'self': 当前进程, 'children': 已结束子进程中的最大值} 的峰值常驻内存（字节）
+
+    依赖 resource 模块，平台不支持（如 Windows）时返回 None。
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss 在 macOS 上以字节为单位，在 Linux 上以 KB 为单位
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return {'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale}
+
+class RunProfiler:
+    """记录每个阶段的墙钟时间与 CPU 时间，以及链对数、输出大小等计数
+
+    同一阶段可多次进入，时间累加。CPU 时间包含已结束的工作进程。
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counts = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        wall, cpu = time.perf_counter(), _cpu_time()
+        try:
+            yield
+        finally:
+            record = self.stages.setdefault(name, {'wall_s': 0.0, 'cpu_s': 0.0})
+            record['wall_s'] += time.perf_counter() - wall
+            record['cpu_s'] += _cpu_time() - cpu
+
+    def metrics(self, **info):
+        """返回可序列化为 JSON 的性能指标，info 为附加的运行信息"""
+        return {
+            **info,
+            'wall_s': time.perf_counter() - self.started,
+            'stages': self.stages,
+            'counts': self.counts,
+            'peak_memory_bytes': peak_memory_bytes(),
+        }
+
+    def write(self, filename, **info):
+        """将性能指标写入 JSON 文件"""
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.metrics(**info), f, ensure_ascii=False, indent=2)
+
+    def summary(self):
+        """返回便于阅读的性能摘要"""
+        lines = ["各阶段耗时（墙钟 / CPU，秒）："]
+        for name, record in self.stages.items():
+            lines.append(f"  {name:<10}{record['wall_s']:>10.3f}{record['cpu_s']:>10.3f}")
+        counts = self.counts
+        if 'pairs_total' in counts:
+            lines.append(f"链对：共 {counts['pairs_total']}，种子跳过 {counts['pairs_pruned']}，"
+                         f"上界跳过 {counts['pairs_bounded']}，缓存命中 {counts['pairs_cached']}，"
+                         f"比对 {counts['pairs_aligned']}；配对区域 {counts['pairings']}")
+        if 'html_bytes' in counts:
+            lines.append(f"HTML 输出：{counts['html_bytes']} 字节")
+        memory = peak_memory_bytes()
+        if memory is not None:
+            lines.append(f"峰值内存：主进程 {memory['self'] / 2**20:.1f} MB，"
+                         f"工作进程 {memory['children'] / 2**20:.1f} MB")
+        return '\n'.join(lines)
+
+# 配对信息各字段的名称，与 build_pairing 返回的元组一一对应
+Pairing = collections.namedtuple('Pairing', [name for name, _ in RESULT_COLUMNS])
+
+def screen(chains, mode='strict', as_array=False, **options):
+    """库接口：比对所有链对并直接返回结构化结果，不生成任何 HTML
+
+    chains 为 {链名: 序列}、(链名, 序列) 列表或 SequenceStore，序列会先规范化
+    （大写、U 转为 T）。mode 为 'strict' 或 'relaxed'，其余关键字参数（min_length、
+    top_k、min_score、max_sites、workers 等）与 find_pairings 相同。
+    返回 Pairing 列表；as_array 为 True 时返回 NumPy 结构化数组（与 --export .npy 相同）。
+
+        >>> import IriSeq
+        >>> IriSeq.screen({'a': 'GAGCGTTAGCC', 'b': 'GGCTAACGCTC'})[0].score
+        11.0
+    """
+    if mode not in MODES:
+        raise ValueError(f"未知的比对模式：{mode}，可选：{', '.join(MODES)}")
+    if not isinstance(chains, SequenceStore):
+        items = chains.items() if isinstance(chains, collections.abc.Mapping) else chains
+        chains = SequenceStore((name, normalize_sequence(seq, name)) for name, seq in items)
+    pairings = find_pairings(chains, mode, **options)
+    if as_array:
+        return columns_to_array(list(chains), pairings_to_columns(list(chains), pairings))
+    return [Pairing(*pairing) for pairing in pairings]
+
+def profile_filename(filename, name):
+    """多评分方案时每个方案的输出文件名：在扩展名前插入方案名"""
+    root, extension = os.path.splitext(filename)
+    return f"{root}.{name}{extension}"
+
+def write_result_files(names, mode, columns, export_file=None, heatmap_file=None, heatmap_size=512):
+    """按需导出结果列并生成热图页面"""
+    if export_file:
+        rows = export_results(export_file, names, columns)
+        print(f"已导出 {rows} 个配对区域：{export_file}")
+    if heatmap_file:
+        write_heatmap(heatmap_file, names, mode, best_score_matrix(len(names), columns, heatmap_size))
+        print(f"热图已生成：{heatmap_file}")
+
+# 目标序列中的碱基：统一为大写、U 视为 T；N 等简并碱基保留，但不参与种子匹配
+TARGET_TRANSLATION = bytes.maketrans(b'acgtunrykmswbdhvU', b'ACGTTNRYKMSWBDHVT')
+TARGET_LETTERS = b'ACGTNRYKMSWBDHV'
+TARGET_CODE_LOOKUP = np.full(256, 4, dtype=np.uint8)
+TARGET_CODE_LOOKUP[list(b'ACGT')] = np.arange(4)
+# 报告中每个命中区域两侧额外显示的目标碱基数
+TARGET_CONTEXT = 10
+
+def _iter_file_blocks(filename, block_size):
+    """逐块读取文件：未压缩文件用 mmap 映射，gzip 压缩文件逐块解压"""
+    with open(filename, 'rb') as f:
+        compressed = f.read(2) == b'\x1f\x8b'
+        empty = os.fstat(f.fileno()).st_size == 0
+    if compressed:
+        with gzip.open(filename, 'rb') as f:
+            yield from iter(lambda: f.read(block_size), b'')
+    elif not empty:
+        import mmap
+
+        with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            for start in range(0, len(view), block_size):
+                yield view[start:start + block_size]
+
+def iter_target_chunks(filename, block_size=1 << 22):
+    """流式读取目标序列文件（FASTA 或纯序列），生成 (记录名, 序列块 bytes)
+
+    没有 > 标题行的纯序列文件以文件名（不含扩展名）作为记录名。
+    """
+    record = os.path.splitext(os.path.basename(filename))[0]
+    # header 为尚未读完的标题行或注释行；序列部分读到即生成，不跨块保留，
+    # 因此单行的超长序列也只占一块的内存
+    header, line_start = None, True
+    for block in itertools.chain(_iter_file_blocks(filename, block_size), [b'\n']):
+        pos = 0
+        while pos < len(block):
+            if header is None and line_start and block[pos:pos + 1] in (b'>', b';'):
+                header = b''
+            if header is not None:
+                end = block.find(b'\n', pos)
+                if end < 0:
+                    header += block[pos:]
+                    break
+                header += block[pos:end]
+                if header.startswith(b'>'):
+                    record = _header_name(header[1:].decode('utf-8', 'replace').strip())
+                header, line_start, pos = None, True, end + 1
+                continue
+            # 序列一直延续到下一个以 > 或 ; 开头的行
+            ends = [end for end in (block.find(b'\n>', pos), block.find(b'\n;', pos)) if end >= 0]
+            end = min(ends) + 1 if ends else len(block)
+            piece = block[pos:end].translate(TARGET_TRANSLATION, b' \t\r\n')
+            line_start, pos = block[end - 1:end] == b'\n', end
+            invalid = piece.translate(None, TARGET_LETTERS)
+            if invalid:
+                raise ValueError(f"目标序列 {record} 含非法字符 {''.join(sorted(set(invalid.decode('latin-1'))))!r}")
+            if piece:
+                yield record, piece
+
+def iter_target_windows(filename, window=1 << 20, overlap=0):
+    """按记录把目标序列切成相邻重叠 overlap 个碱基的窗口，生成 (记录名, 起点, 窗口 bytes, 是否为记录末尾)"""
+    record, start, buffer = None, 0, bytearray()
+    for name, piece in iter_target_chunks(filename):
+        if name != record:
+            if record is not None:
+                yield record, start, bytes(buffer), True
+            record, start, buffer = name, 0, bytearray()
+        buffer += piece
+        while len(buffer) > window:
+            yield record, start, bytes(buffer[:window]), False
+            del buffer[:window - overlap]
+            start += window - overlap
+    if record is not None:
+        yield record, start, bytes(buffer), True
+
+def kmer_codes(codes, k):
+    """将碱基编码数组中每个长度为 k 的窗口编码为整数（每个碱基 2 位），返回 (编码, 是否只含 A/C/G/T)"""
+    n = len(codes) - k + 1
+    if n <= 0:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=bool)
+    values = np.zeros(n, dtype=np.uint64)
+    for offset in range(k):
+        values = (values << np.uint64(2)) | (codes[offset:offset + n] & 3).astype(np.uint64)
+    invalid = np.concatenate(([0], np.cumsum(codes > 3)))
+    return values, invalid[k:] == invalid[:n]
+
+def _target_profile(codes):
+    """为目标片段构建只含编码与 GC 前缀和的 ChainProfile，供 align_pair 使用"""
+    gc_prefix = np.concatenate(([0], np.cumsum((codes == 1) | (codes == 2))))
+    return ChainProfile(codes, None, gc_prefix)
+
+def scan_target(probes, target_file, mode='strict', min_length=5, seed_k=None, window=1 << 20, stats=None):
+    """在长目标序列中查找与探针互补的区域，生成 (配对信息, 片段起点, 目标片段)
+
+    配对信息中链1为探针，链2为目标记录名，链2的坐标为目标记录上的坐标；片段为命中区域两侧
+    各加 TARGET_CONTEXT 个碱基，供生成报告使用。目标文件按重叠窗口流式读取，所有探针反向互补
+    序列的 k-mer 一次性在窗口中查找，只比对种子所在的对角线，因此不会载入整个目标。
+
+    严格模式报告对角线上每段长度不小于 min_length 的连续互补区域；宽松模式把相距不超过半个探针长度的
+    对角线合并为一组，在组两侧各加半个探针长度后用 PairwiseAligner 比对一次，被同一探针已报告命中
+    包含的比对不再报告。宽松模式只能找到含长度为 k 的连续互补种子的区域。
+    """
+    strict = mode == 'strict'
+    k = resolve_seed_k(seed_k, strict, min_length) or min_length
+    if k > 31:
+        # k-mer 以 2 位编码存入 uint64，最长 31 个碱基；默认种子取 min(min_length, 31)，
+        # 更长的连续互补区域必然包含 31 个碱基的种子，只有显式指定的 --seed-k 超过 31 才报错
+        if seed_k:
+            raise ValueError(f"种子长度 k={k} 不能超过 31")
+        k = 31
+    names = list(probes)
+    profiles = build_chain_profiles(probes)
+    aligner = None if strict else LazyAligner(strict=False)
+    flanks = [0 if strict else len(profile) // 2 for profile in profiles]
+    # 相邻窗口的重叠部分能容纳任一探针的比对区域（对角线组的跨度不超过 flank），每组只在完整包含它的窗口中比对
+    overlap = max(len(profile) + 3 * flank for profile, flank in zip(profiles, flanks))
+    window = max(window, 2 * overlap)
+
+    # 所有探针反向互补序列的 k-mer 表，按编码排序
+    entry_codes, entry_probes, entry_positions = [], [], []
+    for index, profile in enumerate(profiles):
+        values, valid = kmer_codes(profile.rc_codes, k)
+        positions = np.flatnonzero(valid)
+        entry_codes.append(values[positions])
+        entry_probes.append(np.full(len(positions), index, dtype=np.int64))
+        entry_positions.append(positions)
+    entry_codes = np.concatenate(entry_codes)
+    order = np.argsort(entry_codes, kind='stable')
+    entry_codes = entry_codes[order]
+    entry_probes = np.concatenate(entry_probes)[order]
+    entry_positions = np.concatenate(entry_positions)[order]
+
+    if stats is None:
+        stats = {}
+    stats.update(windows=0, bases=0, seed_hits=0, diagonals=0, regions=0, seed_k=k)
+    group_first = {}  # 探针 -> 当前记录中最近一组对角线的首条对角线（记录坐标）
+    reported = {}  # 探针 -> 已接受的命中（配对信息），用于去掉被包含的命中
+    pending = {}  # 探针 -> 之后的区域仍可能包含的 (配对信息, 命中)，暂不输出
+    current_record = None
+    for record, start, seq, last in iter_target_windows(target_file, window, overlap):
+        if record != current_record:
+            for waiting in pending.values():
+                yield from (hit for _, hit in waiting)
+            group_first.clear()
+            reported.clear()
+            pending.clear()
+            current_record = record
+        stats['windows'] += 1
+        stats['bases'] += len(seq) - (0 if last else overlap)
+        codes = TARGET_CODE_LOOKUP[np.frombuffer(seq, dtype=np.uint8)]
+        values, valid = kmer_codes(codes, k)
+        positions = np.flatnonzero(valid)
+        low = np.searchsorted(entry_codes, values[positions], 'left')
+        counts = np.searchsorted(entry_codes, values[positions], 'right') - low
+        hit = counts > 0
+        positions, low, counts = positions[hit], low[hit], counts[hit]
+        if not len(positions):
+            continue
+        # 展开每个种子命中对应的全部 (探针, 位置)，得到去重后的 (探针, 对角线)，按探针、对角线排序
+        entries = np.repeat(low - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        diagonals = np.repeat(positions, counts) - entry_positions[entries]
+        stats['seed_hits'] += len(entries)
+        step = len(seq) - overlap
+        # 同一探针上与组内首条对角线相距不超过 flank 的对角线（空位造成的偏移）合并为一组，只比对一次；
+        # 组的跨度不超过 flank，整个比对区域落在重叠部分内，组归属于首条对角线区域起点所在的窗口
+        groups, open_groups = [], {}
+        for index, diagonal in np.unique(np.stack([entry_probes[entries], diagonals], axis=1), axis=0).tolist():
+            first = group_first.get(index)
+            if first is not None and start + diagonal - first <= flanks[index]:
+                if index in open_groups:
+                    open_groups[index][2] = diagonal
+                    stats['diagonals'] += 1
+                continue
+            region_start = diagonal - flanks[index]
+            if (start and region_start < 0) or (not last and region_start >= step):
+                continue
+            group_first[index] = start + diagonal
+            open_groups[index] = [index, diagonal, diagonal]
+            groups.append(open_groups[index])
+            stats['diagonals'] += 1
+        stats['regions'] += len(groups)
+
+        for index, first, last_diagonal in groups:
+            profile, flank = profiles[index], flanks[index]
+            if strict:
+                yield from _strict_diagonal_hits(names[index], record, profile, seq, codes, start,
+                                                 first, min_length)
+                continue
+            region_start = max(first - flank, 0)
+            region_end = min(last_diagonal + len(profile) + flank, len(seq))
+            # 同一探针的区域按起点递增处理：在本区域起点之前开始的命中不会再被之后的命中包含，
+            # 在本区域起点之前结束的命中也不会再包含之后的命中
+            boundary = start + region_start
+            waiting = pending.pop(index, [])
+            yield from (hit for pairing, hit in waiting if pairing[4] < boundary)
+            waiting = [(pairing, hit) for pairing, hit in waiting if pairing[4] >= boundary]
+            earlier = [pairing for pairing in reported.get(index, ()) if pairing[5] >= boundary]
+            reported[index], pending[index] = earlier, waiting
+            pairing = align_pair(aligner, names[index], record, profile,
+                                 _target_profile(codes[region_start:region_end]), min_length)
+            if pairing is None:
+                continue
+            c2_start, c2_end = pairing[4] + region_start, pairing[5] + region_start
+            pairing = pairing[:4] + (start + c2_start, start + c2_end) + pairing[6:]
+            # 相邻区域可能得到同一个比对或其一部分
+            if any(_pairing_contains(other, pairing) for other in earlier):
+                continue
+            reported[index] = [other for other in earlier if not _pairing_contains(pairing, other)] + [pairing]
+            pending[index] = [(other, hit) for other, hit in waiting if not _pairing_contains(pairing, other)]
+            pending[index].append((pairing, _target_hit(pairing, seq, start, c2_start, c2_end)))
+    for waiting in pending.values():
+        yield from (hit for _, hit in waiting)
+
+def _pairing_contains(outer, inner):
+    """outer 在两条链上的区域是否都包含 inner 的区域"""
+    return outer[2] <= inner[2] and inner[3] <= outer[3] and outer[4] <= inner[4] and inner[5] <= outer[5]
+
+def _strict_diagonal_hits(probe, record, profile, seq, codes, start, diagonal, min_length):
+    """严格模式：生成一条对角线上每段长度不小于 min_length 的连续互补区域"""
+    first, last = max(0, -diagonal), min(len(profile), len(seq) - diagonal)
+    matches = profile.rc_codes[first:last] == codes[diagonal + first:diagonal + last]
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], matches, [False])).astype(np.int8)))
+    for run_start, run_end in zip(edges[::2].tolist(), edges[1::2].tolist()):
+        if run_end - run_start < min_length:
+            continue
+        c2_start, c2_end = diagonal + first + run_start, diagonal + first + run_end - 1
+        run_codes = codes[c2_start:c2_end + 1]
+        pairing = (probe, record, len(profile) - first - run_end, len(profile) - first - run_start - 1,
+                   start + c2_start, start + c2_end, float(run_end - run_start),
+                   int(np.count_nonzero((run_codes == 1) | (run_codes == 2))))
+        yield _target_hit(pairing, seq, start, c2_start, c2_end)
+
+def _target_hit(pairing, seq, start, c2_start, c2_end):
+    """为命中附加报告用的目标片段（窗口内坐标 c2_start/c2_end 两侧各加 TARGET_CONTEXT 个碱基）"""
+    excerpt_start = max(c2_start - TARGET_CONTEXT, 0)
+    excerpt_end = min(c2_end + 1 + TARGET_CONTEXT, len(seq))
+    return pairing, start + excerpt_start, seq[excerpt_start:excerpt_end].decode('ascii')
+
+def target_report_chains(probes, hits):
+    """由探针与命中片段构建报告用的链与配对：片段以“记录名:起点-终点”（从 1 开始）命名"""
+    chains = dict(probes.items())
+    pairings = []
+    for pairing, excerpt_start, excerpt in hits:
+        name = f"{pairing[1]}:{excerpt_start + 1}-{excerpt_start + len(excerpt)}"
+        chains[name] = excerpt
+        pairings.append((pairing[0], name, pairing[2], pairing[3],
+                         pairing[4] - excerpt_start, pairing[5] - excerpt_start) + pairing[6:])
+    return chains, pairings
+
+class ScreenSession:
+    """常驻服务的比对状态：链的预处理结果与有配对的链对结果都保存在内存中
+
+    增删改链时只重新比对涉及这些链的链对。链按加入顺序占用固定的槽位，修改时
+    保留槽位、删除时留空，因此链对方向（先出现的链为链1）与 find_pairings 一致。
+    比对在当前进程中进行：会话保存自己的比对器与后缀自动机，比对前装入 _worker_state。
+    每个配对有固定的颜色层编号，每条链记录序列最后修改时的版本，已打开的页面据此只更新变化的部分。
+    """
+
+    def __init__(self, chains, mode, engine='auto', min_length=5, seed_k=None, max_sites=1,
+                 min_site_score=None):
+        strict = mode == 'strict'
+        self.mode = mode
+        self.seed_k = resolve_seed_k(seed_k, strict, min_length)
+        self.slots = {}  # 链名 -> 槽位
+        self.chain_items = []  # 槽位 -> (链名, ChainProfile)，删除后为 None
+        self.kmers = []  # 槽位 -> (k-mer 集合, 反向互补序列的 k-mer 集合)
+        self.results = {}  # (槽位 i, 槽位 j) -> 配对信息列表，i < j，只保存有配对的链对
+        self.layers = {}  # (槽位 i, 槽位 j) -> 与 results 对应的颜色层编号，编号不重复使用
+        self.next_layer = 0
+        self.stamps = []  # 槽位 -> 序列最后修改时的版本
+        self.version = 0
+        self.lock = threading.Condition()  # 修改状态时持有，并通知等待更新的页面
+        engine = resolve_engine(engine, strict, max_sites=max_sites)
+        _init_worker(self.chain_items, strict, engine, min_length, max_sites, min_site_score)
+        self.worker_state = dict(_worker_state)
+        self.update(chains)
+
+    def _forget(self, slot):
+        """丢弃槽位 slot 的比对结果与缓存的后缀自动机"""
+        for pair in [pair for pair in self.results if slot in pair]:
+            del self.results[pair]
+            del self.layers[pair]
+        self.worker_state['automata'].pop(slot, None)
+
+    def _candidate_pairs(self, slots):
+        """返回涉及 slots 中任一槽位的链对，按种子预筛选"""
+        pairs = set()
+        for slot in slots:
+            for other, item in enumerate(self.chain_items):
+                if item is None or other == slot:
+                    continue
+                i, j = min(slot, other), max(slot, other)
+                if self.seed_k and self.kmers[i][1].isdisjoint(self.kmers[j][0]):
+                    continue
+                pairs.add((i, j))
+        return sorted(pairs)
+
+    def update(self, chains):
+        """加入或修改若干条链（{链名: 序列}），只重新比对涉及它们的链对，返回比对的链对数"""
+        # 先校验全部序列，出错时不修改会话状态
+        chains = {name: normalize_sequence(seq, name) for name, seq in chains.items()}
+        changed = []
+        for name, seq in chains.items():
+            slot = self.slots.get(name)
+            if slot is None:
+                slot = self.slots[name] = len(self.chain_items)
+                self.chain_items.append(None)
+                self.kmers.append(None)
+                self.stamps.append(None)
+            elif self.chain_items[slot][1].seq == seq:
+                continue
+            self._forget(slot)
+            profile = build_chain_profiles({name: seq})[0]
+            self.chain_items[slot] = (name, profile)
+            self.stamps[slot] = self.version + 1
+            if self.seed_k:
+                self.kmers[slot] = (set(iter_kmers(seq, self.seed_k)), set(iter_kmers(profile.rc_seq, self.seed_k)))
+            changed.append(slot)
+        pairs = self._candidate_pairs(changed)
+        _worker_state.update(self.worker_state)
+        for chunk in iter_chunks(pairs, 256):
+            for pair, pair_sites in zip(chunk, _align_chunk_results(chunk)):
+                if pair_sites:
+                    self.results[pair] = pair_sites
+                    self.layers[pair] = list(range(self.next_layer, self.next_layer + len(pair_sites)))
+                    self.next_layer += len(pair_sites)
+        if changed:
+            self.version += 1
+        return len(pairs)
+
+    def remove(self, name):
+        """删除一条链及其配对结果；链不存在时抛出 KeyError"""
+        slot = self.slots.pop(name)
+        self._forget(slot)
+        self.chain_items[slot] = None
+        self.kmers[slot] = None
+        self.version += 1
+
+    def chains(self):
+        """按链的顺序返回 {链名: 序列}"""
+        return {item[0]: item[1].seq for item in self.chain_items if item is not None}
+
+    def pairings(self):
+        """按 find_pairings 的顺序返回全部配对信息"""
+        return [pairing for pair in sorted(self.results) for pairing in self.results[pair]]
+
+    def report_state(self):
+        """返回 (版本, {链名: (修改版本, ChainProfile)}, {颜色层: 配对信息})，均按报告中的顺序
+
+        ChainProfile 创建后不再修改，调用者可以在释放锁之后再解码序列、生成页面。
+        """
+        chains = {item[0]: (self.stamps[slot], item[1])
+                  for slot, item in enumerate(self.chain_items) if item is not None}
+        items = {layer: pairing for pair in sorted(self.results)
+                 for layer, pairing in zip(self.layers[pair], self.results[pair])}
+        return self.version, chains, items
+
+# 常驻服务模式下嵌入报告页面的脚本：收到更新后只删除、插入变化的配对按钮与链卡片（见 live_update），
+# 页面不重新加载，滚动位置与已显示的配对保持不变；#live-update 记录页面对应的会话版本
+LIVE_UPDATE_SCRIPT = """
+            <div id="live-update" data-version="%d" hidden></div>
+            <script>
+                (function() {
+                    const marker = document.getElementById('live-update');
+                    const controls = document.querySelector('.controls .d-flex');
+                    const parse = text => {
+                        const template = document.createElement('template');
+                        template.innerHTML = text.trim();
+                        return template.content.firstElementChild;
+                    };
+                    const button = layer => controls.querySelector(`button[onclick="toggleLayer('layer-${layer}')"]`);
+                    const events = new EventSource(`/events?version=${marker.dataset.version}`);
+                    events.addEventListener('update', e => {
+                        const update = JSON.parse(e.data);
+                        // 页面与会话版本不一致（如重新连接前错过了更新）时才重新加载
+                        if (update.reload) {
+                            location.reload();
+                            return;
+                        }
+                        update.removed_layers.forEach(layer => {
+                            const node = button(layer);
+                            if (node) node.remove();
+                            document.body.classList.remove(`show-layer-${layer}`);
+                        });
+                        // 新按钮按报告顺序插入在前一个配对的按钮之后
+                        update.buttons.forEach(([layer, after, text]) => {
+                            (after === null ? controls.querySelector('.relaxed-mode') : button(after)).after(parse(text));
+                        });
+                        if (update.styles) document.head.insertAdjacentHTML('beforeend', update.styles);
+                        const cards = new Map([...document.querySelectorAll('.card[data-chain]')]
+                            .map(card => [card.dataset.chain, card]));
+                        update.removed_chains.forEach(name => {
+                            if (cards.has(name)) cards.get(name).remove();
+                            cards.delete(name);
+                        });
+                        // 新链总在最后，修改的链原地替换
+                        let last = [...cards.values()].pop() || marker;
+                        update.cards.forEach(([name, text]) => {
+                            const card = parse(text);
+                            if (cards.has(name)) {
+                                cards.get(name).replaceWith(card);
+                            } else {
+                                last.after(card);
+                                last = card;
+                            }
+                            cards.set(name, card);
+                        });
+                        if (update.data) document.dispatchEvent(new CustomEvent('iriseq:data', { detail: update.data }));
+                        marker.dataset.version = update.version;
+                    });
+                })();
+            </script>
+    """
+
+def live_update(previous, current, view='dom'):
+    """比较两次 ScreenSession.report_state()，返回推送给已打开页面的增量更新
+
+    只包含删除的颜色层、新增的配对按钮（及其前一个配对的颜色层）与样式，以及序列或标注
+    变化的链卡片；virtual 显示方式没有链卡片，改为附带查看器数据，由页面重新布局。
+    """
+    _, old_chains, old_items = previous
+    version, chains, items = current
+    removed_layers = [layer for layer in old_items if layer not in items]
+    buttons, added, after = [], [], None
+    for layer, pairing in items.items():
+        if layer not in old_items:
+            buttons.append([layer, after, generate_pairing_button(layer, pairing)])
+            added.append(layer)
+        after = layer
+    # 标注变化的链：新增或删除的配对涉及的链，以及序列修改过的链
+    touched = {name for layer in removed_layers for name in old_items[layer][:2]}
+    touched.update(name for layer in added for name in items[layer][:2])
+    changed = [name for name, (stamp, _) in chains.items()
+               if name in touched or name not in old_chains or old_chains[name][0] != stamp]
+    update = {'version': version, 'removed_layers': removed_layers, 'buttons': buttons,
+              'removed_chains': [name for name in old_chains if name not in chains], 'cards': []}
+    if view == 'virtual':
+        layers = list(items)
+        update['data'] = viewer_data({name: profile.seq for name, (_, profile) in chains.items()},
+                                     list(items.values()), {layer: layer_color(layer) for layer in layers}, layers)
+        return update
+    changed_set = set(changed)
+    layers = [layer for layer, pairing in items.items() if changed_set.intersection(pairing[:2])]
+    pairings = [items[layer] for layer in layers]
+    _, annotated_chains = build_annotations(
+        dict.fromkeys(changed + [name for pairing in pairings for name in pairing[:2]]), pairings, layers)
+    update['cards'] = [[name, ''.join(generate_chain_card(name, chains[name][1].seq, annotated_chains[name]))]
+                       for name in changed]
+    if added:
+        update['styles'] = generate_layer_styles(added, {layer: layer_color(layer) for layer in added}, added)
+    return update
+
+class ScreenRequestHandler:
+    """常驻服务的 HTTP 接口，由 serve 与 http.server.BaseHTTPRequestHandler 组合使用，
+    因此导入 IriSeq 时不加载 http.server
+
+    GET  /                    当前报告页面，链或配对变化时只更新变化的部分
+    GET  /events?version=N    Server-Sent Events 增量更新（见 live_update），N 为页面对应的会话版本
+    GET  /api/chains          {链名: 序列}
+    GET  /api/pairings        配对信息列表
+    POST /api/chains          加入或修改链：{"name": ..., "seq": ...} 或 {"chains": {链名: 序列}}
+    DELETE /api/chains/<链名>  删除链
+
+    Host 不是本服务地址的请求一律拒绝（防止 DNS 重绑定）；修改状态的请求还要求 Origin
+    （如有）为本服务地址，POST 的 Content-Type 必须为 application/json，使其他网页
+    无法通过无需预检的跨站请求修改链并向报告中注入内容。
+    """
+
+    def _send(self, status, body, content_type='application/json; charset=utf-8'):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status, value):
+        self._send(status, json.dumps(value, ensure_ascii=False))
+
+    def _local_addresses(self):
+        """本服务可接受的 Host 值：绑定地址、127.0.0.1 与 localhost 加端口"""
+        host, port = self.server.server_address[:2]
+        return {f"{name}:{port}" for name in (host, '127.0.0.1', 'localhost')}
+
+    def _reject_foreign(self, modifying=False):
+        """Host 或 Origin 不是本服务时返回 403 并返回 True"""
+        addresses = self._local_addresses()
+        origin = self.headers.get('Origin')
+        if self.headers.get('Host') not in addresses:
+            error = "Host 不是本服务地址"
+        elif modifying and origin is not None and origin not in {f"http://{address}" for address in addresses}:
+            error = f"不接受来自 {origin} 的跨站请求"
+        else:
+            return False
+        self._send_json(403, {'error': error})
+        return True
+
+    def do_GET(self):
+        if self._reject_foreign():
+            return
+        session = self.server.session
+        path = urllib.parse.urlparse(self.path).path
+        if path == '/events':
+            return self._stream_events()
+        if path == '/':
+            with session.lock:
+                version, chain_state, items = session.report_state()
+            chains = {name: profile.seq for name, (_, profile) in chain_state.items()}
+            pairings, layers = list(items.values()), list(items)
+            colors, annotated_chains = build_annotations(chains, pairings, layers)
+            page = ''.join(generate_report(chains, session.mode, pairings, colors, annotated_chains,
+                                           self.server.view, LIVE_UPDATE_SCRIPT % version, layers=layers))
+            return self._send(200, page, 'text/html; charset=utf-8')
+        with session.lock:
+            chains, pairings = session.chains(), session.pairings()
+        if path == '/api/chains':
+            self._send_json(200, chains)
+        elif path == '/api/pairings':
+            self._send_json(200, [Pairing(*pairing)._asdict() for pairing in pairings])
+        else:
+            self._send_json(404, {'error': f"未知路径：{path}"})
+
+    def do_POST(self):
+        if self._reject_foreign(modifying=True):
+            return
+        session = self.server.session
+        if urllib.parse.urlparse(self.path).path != '/api/chains':
+            return self._send_json(404, {'error': f"未知路径：{self.path}"})
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            return self._send_json(415, {'error': "请求的 Content-Type 应为 application/json"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            chains = body['chains'] if 'chains' in body else {body['name']: body['seq']}
+            # 修改会话前校验全部条目：链名与序列都必须是字符串，否则链名会破坏之后的报告与删除
+            if not isinstance(chains, dict):
+                raise TypeError("chains 应为 {链名: 序列} 对象")
+            for name, seq in chains.items():
+                if not isinstance(name, str) or not name or not isinstance(seq, str):
+                    raise TypeError(f"链名应为非空字符串、序列应为字符串：{name!r}")
+            started = time.perf_counter()
+            with session.lock:
+                aligned = session.update(chains)
+                pairings = len(session.pairings())
+                version = session.version
+                session.lock.notify_all()
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            return self._send_json(400, {'error': f"请求有误：{error}"})
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"更新 {', '.join(chains)}：比对 {aligned} 对链，用时 {elapsed_ms:.1f} ms，共 {pairings} 个配对区域")
+        self._send_json(200, {'version': version, 'aligned_pairs': aligned, 'pairings': pairings,
+                              'elapsed_ms': elapsed_ms})
+
+    def do_DELETE(self):
+        if self._reject_foreign(modifying=True):
+            return
+        session = self.server.session
+        path = urllib.parse.urlparse(self.path).path
+        prefix = '/api/chains/'
+        if not path.startswith(prefix):
+            return self._send_json(404, {'error': f"未知路径：{path}"})
+        name = urllib.parse.unquote(path[len(prefix):])
+        with session.lock:
+            try:
+                session.remove(name)
+            except KeyError:
+                return self._send_json(404, {'error': f"未找到链 {name}"})
+            version = session.version
+            session.lock.notify_all()
+        print(f"删除 {name}")
+        self._send_json(200, {'version': version})
+
+    def _stream_events(self):
+        """向页面推送增量更新（见 live_update），空闲时定期发送注释保持连接
+
+        每个连接记住上次推送后的会话状态，更新时与之比较；页面版本与会话不一致时通知页面重新加载。
+        """
+        session = self.server.session
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        try:
+            page_version = int(query.get('version', ['-1'])[0])
+        except ValueError:
+            page_version = -1
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        with session.lock:
+            state = session.report_state()
+        message = None
+        if state[0] != page_version:
+            message = {'version': state[0], 'reload': True}
+        while True:
+            try:
+                if message is None:
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    self.wfile.write(f"event: update\ndata: {json.dumps(message, ensure_ascii=False)}\n\n".encode())
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            with session.lock:
+                session.lock.wait_for(lambda: session.version != state[0], timeout=15)
+                current = session.report_state() if session.version != state[0] else None
+            # 在锁外生成变化的按钮与链卡片
+            message = None if current is None else live_update(state, current, self.server.view)
+            state = current or state
+
+    def log_message(self, format, *args):
+        # 只打印链的更新，不逐条记录请求
+        pass
+
+def serve(session, port=8765, host='127.0.0.1', view='dom'):
+    """启动常驻服务，阻塞直到按 Ctrl+C 停止"""
+    import http.server
+
+    handler = type('ScreenHTTPRequestHandler', (ScreenRequestHandler, http.server.BaseHTTPRequestHandler), {})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.session = session
+    server.view = view
+    print(f"IriSeq 服务已启动：http://{host}:{server.server_address[1]}/ （按 Ctrl+C 停止）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def run_target(args, chains, mode, profiler):
+    """探针-目标模式（--target）：探针与长目标序列比对，目标按窗口流式读取，报告只包含命中附近的片段"""
+    target_stats = {}
+    try:
+        with profiler.stage('align'):
+            hits = list(scan_target(chains, args.target, mode, args.min_length, args.seed_k, args.target_window,
+                                    target_stats))
+    except (ValueError, OSError) as error:
+        print(f"错误：{error}")
+        return
+    pairings = [pairing for pairing, _, _ in hits]
+    print(f"目标序列 {args.target}：{target_stats['bases']} bp，{target_stats['windows']} 个窗口，"
+          f"种子（k={target_stats['seed_k']}）命中 {target_stats['seed_hits']} 处，"
+          f"比对 {target_stats['regions']} 个区域（{target_stats['diagonals']} 条对角线）")
+    print(f"检测到 {len(pairings)} 个命中区域")
+    for chain1, chain2, c1_start, c1_end, c2_start, c2_end, score, gc_pairs in sorted(
+            pairings, key=lambda pairing: -pairing[6])[:20]:
+        print(f"  {chain1} {c1_start + 1}-{c1_end + 1} ↔ {chain2}:{c2_start + 1}-{c2_end + 1}"
+              f"  得分 {score:g}，{gc_pairs} 个 GC 对")
+    if len(pairings) > 20:
+        print(f"  ……其余 {len(pairings) - 20} 个命中区域见报告或 --export 导出文件")
+    try:
+        with profiler.stage('export'):
+            names = list(chains) + list(dict.fromkeys(pairing[1] for pairing in pairings))
+            write_result_files(names, mode, pairings_to_columns(names, pairings), args.export)
+    except ValueError as error:
+        print(f"错误：{error}")
+    if args.report:
+        report_chains, report_pairings = target_report_chains(chains, hits)
+        with profiler.stage('annotate'):
+            colors, annotated_chains = build_annotations(report_chains, report_pairings)
+        with profiler.stage('render'):
+            write_report(args.output, report_chains, mode, report_pairings, colors, annotated_chains, args.view)
+        print(f"HTML 文件已生成：{args.output}")
+    if args.profile:
+        profiler.counts.update(chains=len(chains), target_bases=target_stats['bases'],
+                               seed_hits=target_stats['seed_hits'], pairings=len(pairings))
+        profiler.write(args.profile, mode=mode, input=args.input, target=args.target)
+        print(profiler.summary())
+        print(f"性能指标已写入：{args.profile}")
+
+def print_seed_stats(stats):
+    """打印种子预筛选跳过的链对数（未预筛选时不打印）"""
+    if stats['seed_k']:
+        print(f"种子预筛选（k={stats['seed_k']}）：共 {stats['pairs_total']} 对链，"
+              f"跳过 {stats['pairs_pruned']} 对")
+
+def finish_profile(args, chains, mode, names, columns, profiler, profile_name=None):
+    """一个评分方案的结果：可选计算稳定性并打印最稳定的区域，再导出结果
+
+    profile_name 不为 None 时导出文件名中插入方案名（见 profile_filename）。返回以结果行号为键的
+    {行号: (ΔG37, Tm)}，供报告的配对按钮使用；未计算稳定性或分块模式（不生成报告）时返回 None。
+    """
+    pairing_stability = None
+    if args.stability:
+        # 最近邻稳定性：所有配对一次向量化计算，附加到导出结果与按钮上
+        with profiler.stage('stability'):
+            columns.update(nearest_neighbor_stability(chains, columns, args.sodium, args.strand_conc * 1e-6))
+        order = np.argsort(columns['dg37'], kind='stable')[:5]
+        if len(order):
+            print("最稳定的配对区域（ΔG37 从低到高）：")
+        for row in order.tolist():
+            print(f"  {names[columns['chain1'][row]]} & {names[columns['chain2'][row]]}："
+                  f"ΔG37 {columns['dg37'][row]:.2f} kcal/mol，Tm {columns['tm'][row]:.1f} °C")
+        if not args.tiled:
+            pairing_stability = dict(enumerate(zip(columns['dg37'].tolist(), columns['tm'].tolist())))
+    export_file, heatmap_file = args.export, args.heatmap
+    if profile_name is not None:
+        export_file = export_file and profile_filename(export_file, profile_name)
+        heatmap_file = heatmap_file and profile_filename(heatmap_file, profile_name)
+    with profiler.stage('export'):
+        write_result_files(names, mode, columns, export_file, heatmap_file, args.heatmap_size)
+    return pairing_stability
+
+def render_results(args, chains, mode, pairings, profiler, stability=None, profile_groups=None):
+    """生成报告（--pages 时为分页报告），返回写入的 HTML 文件列表"""
+    if args.pages:
+        # 分页报告：索引页加每页有限个配对，各页并行生成（着色在各页中进行）
+        with profiler.stage('render'):
+            pages, _ = write_paged_report(args.pages, chains, mode, pairings, args.view, args.page_size,
+                                          args.workers, stability)
+        html_files = [os.path.join(args.pages, name)
+                      for name in ['index.html'] + [page_filename(page) for page in range(1, pages + 1)]]
+        print(f"分页报告已生成：{html_files[0]}（共 {pages} 页）")
+        return html_files
+    with profiler.stage('annotate'):
+        colors, annotated_chains = build_annotations(chains, pairings)
+
+    # 生成 HTML 并逐块写入文件
+    with profiler.stage('render'):
+        write_report(args.output, chains, mode, pairings, colors, annotated_chains, args.view,
+                     stability=stability, profile_groups=profile_groups)
+    print(f"HTML 文件已生成：{args.output}")
+    return [args.output]
+
+def write_run_profile(args, profiler, chains, stats, pairings, html_files, **metadata):
+    """记录链对计数并写入 --profile 文件，打印摘要；metadata 为写入 JSON 的运行参数"""
+    pairs_bounded = stats.get('pairs_bounded', 0)
+    profiler.counts.update(
+        chains=len(chains),
+        bases=sum(len(seq) for seq in chains.values()),
+        workers=args.workers or os.cpu_count() or 1,
+        pairs_total=stats['pairs_total'],
+        pairs_pruned=stats['pairs_pruned'],
+        pairs_bounded=pairs_bounded,
+        pairs_cached=stats.get('cache_hits', 0),
+        pairs_aligned=stats['pairs_total'] - stats['pairs_pruned'] - pairs_bounded - stats.get('cache_hits', 0),
+        pairings=pairings,
+        html_bytes=sum(os.path.getsize(path) for path in html_files),
+    )
+    profiler.write(args.profile, input=args.input, engine=args.engine, **metadata)
+    print(profiler.summary())
+    print(f"性能指标已写入：{args.profile}")
+
+def run_profiles(args, chains, profiler):
+    """多评分方案（--scoring）：各方案共用链的预处理、链对枚举与进程池，报告中切换方案"""
+    unsupported = [flag for flag, used in (('--top-k', args.top_k), ('--min-score', args.min_score is not None),
+                                            ('--tiled', args.tiled), ('--cache-dir', args.cache_dir),
+                                            ('--pages', args.pages)) if used]
+    if unsupported:
+        print(f"错误：多评分方案（--scoring）暂不支持 {', '.join(unsupported)}")
+        return
+    scorings = [scoring if scoring.min_length is not None else scoring._replace(min_length=args.min_length)
+                for scoring in args.scoring]
+    stats = {}
+    try:
+        with profiler.stage('align'):
+            results = find_profile_pairings(chains, scorings, workers=args.workers, engine=args.engine,
+                                            min_length=args.min_length, seed_k=args.seed_k, stats=stats,
+                                            max_sites=args.max_sites, min_site_score=args.min_site_score)
+    except ValueError as error:
+        print(f"错误：{error}")
+        return
+    print_seed_stats(stats)
+    names = list(chains)
+    pairing_stability = {} if args.stability else None
+    first = 0  # 当前方案第一个配对的颜色层
+    try:
+        for scoring in scorings:
+            pairings = results[scoring.name]
+            print(f"方案 {scoring.name}（匹配 {scoring.match:g}，错配 {scoring.mismatch:g}，"
+                  f"空位 {scoring.gap:g}，最小长度 {scoring.min_length}）：检测到 {len(pairings)} 个配对区域")
+            stability = finish_profile(args, chains, 'strict' if scoring_is_strict(scoring) else 'relaxed', names,
+                                       pairings_to_columns(names, pairings), profiler, scoring.name)
+            if stability is not None:
+                pairing_stability.update((first + row, value) for row, value in stability.items())
+            first += len(pairings)
+    except ValueError as error:
+        print(f"错误：{error}")
+
+    # 多评分方案不做得分上界筛选与缓存，未被种子跳过的链对按每个方案各比对一次
+    all_pairings = [pairing for scoring in scorings for pairing in results[scoring.name]]
+    html_files = []
+    if args.report:
+        html_files = render_results(args, chains, 'strict' if scoring_is_strict(scorings[0]) else 'relaxed',
+                                    all_pairings, profiler, pairing_stability,
+                                    [(scoring, len(results[scoring.name])) for scoring in scorings])
+    if args.profile:
+        profiler.counts.update(profiles=len(scorings))
+        write_run_profile(args, profiler, chains, stats, len(all_pairings), html_files,
+                          scorings=[scoring._asdict() for scoring in scorings])
+
+def run_screen(args, chains, mode, profiler):
+    """全部链对的筛选：比对、导出、稳定性与报告（单页、分页或分块写入磁盘）"""
+    # 遍历所有链对，确保每对链只记录一次
+    stats = {}
+    cache = None
+    if args.cache_dir:
+        cache = AlignmentCache.in_directory(args.cache_dir, mode == 'strict', args.min_length, args.cache_size,
+                                            args.max_sites, args.min_site_score)
+    # 可选：用 cProfile 记录比对阶段（只包含当前进程）
+    alignment_profile = None
+    if args.profile_alignment:
+        import cProfile
+
+        alignment_profile = cProfile.Profile()
+    try:
+        with profiler.stage('align'):
+            if alignment_profile is not None:
+                alignment_profile.enable()
+            if args.tiled:
+                # 分块模式：结果直接写入磁盘，不在内存中汇总，也不生成 HTML
+                hits = screen_tiled(chains, mode, args.tiled, args.tile_size, workers=args.workers,
+                                    engine=args.engine, min_length=args.min_length, seed_k=args.seed_k, stats=stats,
+                                    cache=cache, max_sites=args.max_sites, min_site_score=args.min_site_score,
+                                    progress=lambda done, total, rows: print(
+                                        f"分块 {done}/{total} 完成，累计 {rows} 个配对区域", flush=True))
+            else:
+                pairings = find_pairings(chains, mode, workers=args.workers, engine=args.engine,
+                                         min_length=args.min_length, seed_k=args.seed_k, stats=stats, cache=cache,
+                                         max_sites=args.max_sites, min_site_score=args.min_site_score,
+                                         top_k=args.top_k, min_score=args.min_score)
+                hits = len(pairings)
+    except ValueError as error:
+        print(f"错误：{error}")
+        return
+    finally:
+        if alignment_profile is not None:
+            alignment_profile.disable()
+            alignment_profile.dump_stats(args.profile_alignment)
+        if cache is not None:
+            cache.close()
+    print_seed_stats(stats)
+    if cache is not None:
+        print(f"比对缓存：命中 {stats['cache_hits']} 对，重新比对 {stats['cache_misses']} 对")
+    if args.tiled:
+        if stats['tiles_resumed']:
+            print(f"从断点继续：跳过已完成的 {stats['tiles_resumed']} 个分块")
+        print(f"检测到 {hits} 个配对区域，结果已写入 {args.tiled}")
+    elif args.top_k or args.min_score is not None:
+        print(f"得分上界筛选：跳过 {stats['pairs_bounded']} 对不可能进入结果的链对")
+        print(f"保留 {hits} 个配对区域（按得分从高到低）")
+    else:
+        print(f"检测到 {hits} 个配对区域")
+
+    pairing_stability = None
+    try:
+        with profiler.stage('export'):
+            if args.tiled:
+                names, columns = load_tiled_results(args.tiled)
+            else:
+                names, columns = list(chains), pairings_to_columns(list(chains), pairings)
+        pairing_stability = finish_profile(args, chains, mode, names, columns, profiler)
+    except ValueError as error:
+        print(f"错误：{error}")
+
+    html_files = []
+    if args.report and not args.tiled:
+        html_files = render_results(args, chains, mode, pairings, profiler, pairing_stability)
+    if args.profile:
+        write_run_profile(args, profiler, chains, stats, hits, html_files, mode=mode)
+    if args.profile_alignment:
+        print(f"比对阶段的 cProfile 数据已写入：{args.profile_alignment}")
+
+# 主函数
+def main(argv=None):
+    args = parse_args(argv)
+    profiler = RunProfiler()
+
+    # 从文件读取序列和模式
+    try:
+        with profiler.stage('read'):
+            chains, file_mode = read_sequences_from_file(args.input)
+    except ValueError as error:
+        print(f"错误：{args.input} 格式有误，{error}")
+        return
+    
+    # 检查是否读取到序列
+    if not chains:
+        print(f"错误：未读取到任何序列，请检查 {args.input} 文件")
+        return
+
+    # 只查看一对链的详情时，只比对这两条链
+    if args.detail:
+        missing = [name for name in args.detail if name not in chains]
+        if missing:
+            print(f"错误：未找到链 {', '.join(missing)}")
+            return
+        chains = SequenceStore((name, chains[name]) for name in chains if name in args.detail)
+    # 命令行指定的模式优先于文件第一行
+    mode = args.mode or file_mode
+    
+    # 打印读取到的序列信息
+    print("成功读取以下序列：")
+    for name, seq in chains.items():
+        print(f"{name}: {seq}")
+    print(f"比对模式：{mode}")
+    
+    if args.serve is not None:
+        # 常驻服务模式：保持比对状态，只重新比对修改过的链
+        started = time.perf_counter()
+        session = ScreenSession(chains, mode, args.engine, args.min_length, args.seed_k, args.max_sites,
+                                args.min_site_score)
+        print(f"初始比对完成：{len(session.pairings())} 个配对区域，用时 {time.perf_counter() - started:.2f} 秒")
+        serve(session, args.serve, view=args.view)
+    elif args.target:
+        run_target(args, chains, mode, profiler)
+    elif args.scoring:
+        run_profiles(args, chains, profiler)
+    else:
+        run_screen(args, chains, mode, profiler)
+
+def _scoring_argument(text):
+    """--scoring 的参数类型：解析失败时由 argparse 显示具体原因"""
+    try:
+        return parse_scoring_profile(text)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error)) from None
+
+def _positive_int(text):
+    """--top-k、--max-sites 等计数参数的类型：必须为正整数"""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"应为正整数：{text!r}") from None
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"应为正整数：{value}")
+    return value
+
+# 探针-目标模式（--target）不支持的选项：(选项, parse_args 结果中的属性名)
+TARGET_UNSUPPORTED_OPTIONS = (
+    ('-j/--workers', 'workers'), ('--engine', 'engine'), ('--max-sites', 'max_sites'),
+    ('--min-site-score', 'min_site_score'), ('--top-k', 'top_k'), ('--min-score', 'min_score'),
+    ('--tiled', 'tiled'), ('--heatmap', 'heatmap'), ('--detail', 'detail'), ('--pages', 'pages'),
+    ('--scoring', 'scoring'), ('--stability', 'stability'), ('--serve', 'serve'), ('--cache-dir', 'cache_dir'),
+)
 
-    print("HTML 文件已生成：dna_alignment_visualization.html")
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="IriSeq: Colors reveal pairing")
+    parser.add_argument('-i', '--input', default='seq_input.txt',
+                        help="序列文件：每行 \"名称: 序列\" 的文本、FASTA 或 FASTQ，"
+                             "可为 gzip 压缩文件（默认 seq_input.txt）")
+    parser.add_argument('-o', '--output', default='dna_alignment_visualization.html',
+                        help="HTML 报告文件（默认 dna_alignment_visualization.html）")
+    parser.add_argument('--mode', choices=MODES, default=None,
+                        help="比对模式，优先于输入文件第一行（默认读取文件，FASTA/FASTQ 为 strict）")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="并行比对的进程数，0 表示使用全部 CPU 核心（默认 1，即串行）")
+    parser.add_argument('--engine', choices=ENGINES, default='auto',
+                        help="比对引擎：auto 时严格模式使用后缀自动机，宽松模式使用 NumPy 批量比对")
+    parser.add_argument('--min-length', type=int, default=5,
+                        help="记录配对所需的最小比对长度（默认 5）")
+    parser.add_argument('--seed-k', type=int, default=None,
+                        help="k-mer 种子预筛选的 k 值，0 表示不预筛选；"
+                             "默认严格模式取最小配对长度，宽松模式不预筛选")
+    parser.add_argument('--view', choices=VIEWS, default='dom',
+                        help="报告显示方式：dom 为每个碱基生成元素；virtual 嵌入 JSON 数据，"
+                             "只绘制可见窗口，适合长序列（默认 dom）")
+    parser.add_argument('--max-sites', type=_positive_int, default=1,
+                        help="每对链最多报告的互不重叠配对区域数；大于 1 时报告重复序列中的"
+                             "多个结合位点（默认 1，只报告最优配对）")
+    parser.add_argument('--min-site-score', type=float, default=None,
+                        help="多位点模式下配对区域的最低比对得分（默认只要求达到最小配对长度）")
+    parser.add_argument('--top-k', type=_positive_int, default=None,
+                        help="只保留得分最高的 K 个配对区域，报告按得分从高到低排列")
+    parser.add_argument('--min-score', type=float, default=None,
+                        help="只保留比对得分不低于该值的配对区域")
+    parser.add_argument('--tiled', metavar='DIR', default=None,
+                        help="分块筛选大规模文库：结果逐块写入 DIR 中的列式文件并记录断点，"
+                             "中断后用相同参数重新运行即可继续；此模式不生成 HTML")
+    parser.add_argument('--tile-size', type=_positive_int, default=1000,
+                        help="分块模式下每块的链数（默认 1000）")
+    parser.add_argument('--export', metavar='FILE', default=None,
+                        help="将配对结果导出为表格：按扩展名选择 .csv、.npy（NumPy 结构化数组）"
+                             "或 .parquet（需要 pyarrow）")
+    parser.add_argument('--heatmap', metavar='FILE', default=None,
+                        help="生成整个文库的链对最高得分热图页面")
+    parser.add_argument('--heatmap-size', type=int, default=512,
+                        help="热图的最大边长（像素），链数更多时按链分组取最大值（默认 512）")
+    parser.add_argument('--detail', nargs=2, metavar=('CHAIN1', 'CHAIN2'), default=None,
+                        help="只比对并显示这两条链，用于查看热图中某一对链的详情")
+    parser.add_argument('--pages', metavar='DIR', default=None,
+                        help="将报告分页写入 DIR：index.html 与每页有限个配对的页面，适合配对很多的筛选")
+    parser.add_argument('--page-size', type=_positive_int, default=200,
+                        help="分页报告中每页的配对数（默认 200）")
+    parser.add_argument('--no-report', dest='report', action='store_false',
+                        help="不生成 HTML 报告（大规模文库可配合 --export/--heatmap 使用）")
+    parser.add_argument('--profile', metavar='FILE', default=None,
+                        help="记录各阶段耗时、链对数、峰值内存与 HTML 大小，写入 JSON 文件并打印摘要")
+    parser.add_argument('--profile-alignment', metavar='FILE', default=None,
+                        help="用 cProfile 记录比对阶段（仅当前进程），结果可用 pstats 或 snakeviz 查看")
+    parser.add_argument('--scoring', metavar='PROFILE', type=_scoring_argument, action='append', default=None,
+                        help="评分方案，可重复指定以在一次运行中比较多个方案：内置方案名（strict、relaxed），"
+                             "或 名称=匹配,错配,空位[,最小长度]，如 loose=1,-1,-2,6；报告中可切换方案，"
+                             "--export/--heatmap 按方案分别输出")
+    parser.add_argument('--stability', action='store_true',
+                        help="按最近邻模型计算每个配对区域的 ΔG37 与 Tm（序列按 3'→5' 读取），"
+                             "显示在配对按钮上并写入导出文件；不能与 --target 一起使用")
+    parser.add_argument('--sodium', type=float, default=1.0, help="计算稳定性时的 Na+ 浓度，单位 M（默认 1.0）")
+    parser.add_argument('--strand-conc', type=float, default=0.25,
+                        help="计算 Tm 时的单链总浓度，单位 µM（默认 0.25）")
+    parser.add_argument('--target', metavar='FILE', default=None,
+                        help="探针-目标模式：输入文件中的链作为探针，在长目标序列（FASTA 或纯序列，可 gzip 压缩）"
+                             "中查找互补区域，目标按窗口流式读取，报告只显示命中附近的片段")
+    parser.add_argument('--target-window', type=int, default=1 << 20,
+                        help="探针-目标模式下每个窗口的碱基数（默认 1048576）")
+    parser.add_argument('--serve', metavar='PORT', type=int, nargs='?', const=8765, default=None,
+                        help="以常驻服务运行（默认端口 8765）：在浏览器中打开报告，通过 HTTP 接口增删改链后"
+                             "只重新比对涉及的链对，页面自动刷新")
+    parser.add_argument('--cache-dir', default=None,
+                        help="比对结果缓存目录（如 .iriseq_cache）；重复运行时未修改的链对直接读取缓存")
+    parser.add_argument('--cache-size', type=int, default=1_000_000,
+                        help="缓存的最大条目数，超过时淘汰最久未使用的条目（默认 1000000）")
+    args = parser.parse_args(argv)
+    if args.target:
+        # 探针-目标模式只支持 --export、--no-report、--view、--profile 与种子、窗口相关的选项；
+        # 目标片段可含 N 等非 A/C/G/T 碱基，不在序列存储中，也无法按最近邻模型计算稳定性
+        unsupported = [option for option, dest in TARGET_UNSUPPORTED_OPTIONS
+                       if getattr(args, dest) != parser.get_default(dest)]
+        if unsupported:
+            parser.error(f"--target 不能与 {', '.join(unsupported)} 一起使用")
+    return args
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    multiprocessing.freeze_support()  # 兼容打包后的可执行文件
+    main()
\ No newline at end of file
@@ -0,0 +1,213 @@
+"""IriSeq 性能基准：生成可复现的合成寡核苷酸文库，测量各阶段耗时并检查植入的互补区域
+
+示例：
+    python benchmark.py --sizes 100,200,400 --lengths 25,50,100 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+
+import numpy as np
+
+import IriSeq
+
+def random_sequence(rng, length, gc=0.5):
+    """按给定 GC 含量随机生成序列"""
+    return ''.join(rng.choice('GC') if rng.random() < gc else rng.choice('AT') for _ in range(length))
+
+def generate_library(n, length, gc=0.5, planted=0, planted_length=12, seed=0):
+    """生成 n 条长度为 length 的合成链，并在 planted 对互不相交的链之间植入互补区域
+
+    返回 (chains, planted_hits)。planted_hits 中每项为 (链1, 链2, 链1起点, 链2起点, 长度)，
+    链1 在 chains 中排在链2之前，与 find_pairings 的配对方向一致。
+    """
+    rng = random.Random(seed)
+    names = [f"Oligo{i + 1}" for i in range(n)]
+    seqs = [random_sequence(rng, length, gc) for _ in range(n)]
+    planted = min(planted, n // 2)
+    planted_length = min(planted_length, length)
+    planted_hits = []
+    partners = rng.sample(range(n), 2 * planted)
+    for k in range(planted):
+        i, j = sorted(partners[2 * k:2 * k + 2])
+        start1 = rng.randrange(length - planted_length + 1)
+        start2 = rng.randrange(length - planted_length + 1)
+        # 链2上的区域为链1区域的反向互补
+        region = IriSeq.reverse_complement(seqs[i][start1:start1 + planted_length])
+        seqs[j] = seqs[j][:start2] + region + seqs[j][start2 + planted_length:]
+        planted_hits.append((names[i], names[j], start1, start2, planted_length))
+    return dict(zip(names, seqs)), planted_hits
+
+def write_library(filename, chains, mode):
+    """以 IriSeq 的文本格式写入文库"""
+    with open(filename, 'w') as f:
+        f.write(f"{mode}\n")
+        f.writelines(f"{name}: {seq}\n" for name, seq in chains.items())
+
+def count_planted_found(pairings, planted_hits):
+    """统计被检出的植入区域数：同一对链的配对区域在两条链上都覆盖植入区域"""
+    regions = {}
+    for chain1, chain2, c1_start, c1_end, c2_start, c2_end, _, _ in pairings:
+        regions.setdefault((chain1, chain2), []).append((c1_start, c1_end, c2_start, c2_end))
+    found = 0
+    for chain1, chain2, start1, start2, length in planted_hits:
+        if any(c1_start <= start1 and start1 + length - 1 <= c1_end
+               and c2_start <= start2 and start2 + length - 1 <= c2_end
+               for c1_start, c1_end, c2_start, c2_end in regions.get((chain1, chain2), [])):
+            found += 1
+    return found
+
+def generate_tie_library(n, seed=0, max_length=60):
+    """生成含大量等分比对的短链文库：约一半链为短重复单元（带少量突变），其余为随机序列"""
+    rng = random.Random(seed)
+    chains = {}
+    for i in range(n):
+        length = rng.randint(4, max_length)
+        if rng.random() < 0.5:
+            motif = random_sequence(rng, rng.randint(1, 4))
+            seq = list((motif * length)[:length])
+            for _ in range(rng.randint(0, 3)):
+                seq[rng.randrange(length)] = rng.choice('ACGT')
+            seq = ''.join(seq)
+        else:
+            seq = random_sequence(rng, length)
+        chains[f"Tie{i + 1}"] = seq
+    return chains
+
+# 各模式下与 PairwiseAligner 对照的快速引擎
+FAST_ENGINES = {'strict': 'suffix', 'relaxed': 'numpy'}
+
+def check_engine_equivalence(mode, n, seed=0):
+    """在可复现的等分密集文库上比较快速引擎与 PairwiseAligner 的全部配对结果
+
+    两者必须逐项相同，包括得分相同时选取的比对区域。返回 {'engine', 'chains', 'pairings', 'mismatches'}，
+    mismatches 为只出现在一方的配对数。
+    """
+    chains = generate_tie_library(n, seed)
+    engine = FAST_ENGINES[mode]
+    expected = set(IriSeq.find_pairings(chains, mode, engine='biopython', seed_k=0))
+    actual = set(IriSeq.find_pairings(chains, mode, engine=engine, seed_k=0))
+    return {'engine': engine, 'chains': n, 'pairings': len(expected), 'mismatches': len(expected ^ actual)}
+
+def timed(func, repeat, warmup=1):
+    """先不计时执行 func warmup 次，再执行 repeat 次，返回 (最短耗时, 最后一次的结果)
+
+    预热使首次调用的一次性开销（延迟导入 Biopython、构建比对器、NumPy 首次分配等）不计入耗时。
+    """
+    for _ in range(warmup):
+        func()
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def run_case(n, length, args, workdir):
+    """生成一个文库并测量读取、严格/宽松比对、标注与 HTML 生成的耗时"""
+    chains, planted_hits = generate_library(n, length, args.gc, int(n * args.planted_fraction),
+                                            args.planted_length, args.seed)
+    input_file = os.path.join(workdir, f"library_{n}_{length}.txt")
+    write_library(input_file, chains, 'strict')
+    timings, pairings, planted_found = {}, {}, {}
+
+    timings['read'], (loaded, _) = timed(lambda: IriSeq.read_sequences_from_file(input_file),
+                                         args.repeat, args.warmup)
+    for mode in ('strict', 'relaxed'):
+        timings[f'align_{mode}'], result = timed(
+            lambda: IriSeq.find_pairings(loaded, mode, workers=args.workers, engine=args.engine),
+            args.repeat, args.warmup)
+        pairings[mode] = len(result)
+        planted_found[mode] = count_planted_found(result, planted_hits)
+        if mode == 'strict':
+            strict_pairings = result
+
+    timings['annotate'], (colors, annotated_chains) = timed(
+        lambda: IriSeq.build_annotations(loaded, strict_pairings), args.repeat, args.warmup)
+    report_file = os.path.join(workdir, 'report.html')
+    timings['render'], _ = timed(
+        lambda: IriSeq.write_report(report_file, loaded, 'strict', strict_pairings, colors, annotated_chains),
+        args.repeat, args.warmup)
+
+    return {
+        'n': n,
+        'length': length,
+        'gc': args.gc,
+        'pairs': n * (n - 1) // 2,
+        'timings_s': timings,
+        'pairings': pairings,
+        'planted': len(planted_hits),
+        'planted_found': planted_found,
+        'html_bytes': os.path.getsize(report_file),
+        # 严格模式的最优配对是最长连续互补区域，植入区域必须全部检出
+        'ok': planted_found['strict'] == len(planted_hits),
+    }
+
+def parse_list(text):
+    return [int(value) for value in text.split(',') if value]
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="IriSeq 性能基准")
+    parser.add_argument('--sizes', type=parse_list, default=[50, 100, 200],
+                        help="链数扫描，逗号分隔（默认 50,100,200）")
+    parser.add_argument('--lengths', type=parse_list, default=[25, 50, 100],
+                        help="链长扫描，逗号分隔（默认 25,50,100）")
+    parser.add_argument('--base-size', type=int, default=100, help="链长扫描时的链数（默认 100）")
+    parser.add_argument('--base-length', type=int, default=40, help="链数扫描时的链长（默认 40）")
+    parser.add_argument('--gc', type=float, default=0.5, help="GC 含量（默认 0.5）")
+    parser.add_argument('--planted-fraction', type=float, default=0.1,
+                        help="植入互补区域的链对数占链数的比例（默认 0.1）")
+    parser.add_argument('--planted-length', type=int, default=15, help="植入互补区域的长度（默认 15）")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子（默认 0）")
+    parser.add_argument('--repeat', type=int, default=1, help="每项重复次数，取最短耗时（默认 1）")
+    parser.add_argument('--warmup', type=int, default=1, help="每项计时前不计时的预热次数（默认 1）")
+    parser.add_argument('-j', '--workers', type=int, default=1, help="并行比对的进程数（默认 1）")
+    parser.add_argument('--engine', choices=IriSeq.ENGINES, default='auto', help="比对引擎（默认 auto）")
+    parser.add_argument('--equivalence-chains', type=int, default=80,
+                        help="与 PairwiseAligner 对照检查快速引擎时的链数，0 表示不检查（默认 80）")
+    parser.add_argument('--output', default='benchmark.json', help="结果 JSON 文件（默认 benchmark.json）")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    cases = [(n, args.base_length) for n in args.sizes] + [(args.base_size, length) for length in args.lengths]
+    equivalence = {}
+    if args.equivalence_chains:
+        for mode in FAST_ENGINES:
+            check = equivalence[mode] = check_engine_equivalence(mode, args.equivalence_chains, args.seed)
+            print(f"{mode} 引擎 {check['engine']} 与 PairwiseAligner 对照：{check['pairings']} 个配对，"
+                  f"{check['mismatches']} 处不一致{'  [失败]' if check['mismatches'] else ''}")
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for n, length in dict.fromkeys(cases):
+            run = run_case(n, length, args, workdir)
+            runs.append(run)
+            timings = run['timings_s']
+            print(f"N={n:<6} L={length:<5} read {timings['read']:.3f}s  strict {timings['align_strict']:.3f}s  "
+                  f"relaxed {timings['align_relaxed']:.3f}s  annotate {timings['annotate']:.3f}s  "
+                  f"render {timings['render']:.3f}s  planted {run['planted_found']['strict']}/{run['planted']}"
+                  f"{'' if run['ok'] else '  [失败]'}")
+
+    result = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {key: value for key, value in vars(args).items() if key != 'output'},
+        'equivalence': equivalence,
+        'runs': runs,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入：{args.output}")
+    ok = all(run['ok'] for run in runs) and not any(check['mismatches'] for check in equivalence.values())
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,136 @@
+"""IriSeq 的回归测试：快速引擎与 PairwiseAligner 对照，以及序列文件读取的边界情况
+
+运行：python -m pytest -q
+"""
+import gzip
+
+import pytest
+
+import IriSeq
+import benchmark
+
+
+def reference_pairings(chains, mode, **kwargs):
+    """用 PairwiseAligner（biopython 引擎）且不做种子预筛选得到的配对，作为对照结果"""
+    return set(IriSeq.find_pairings(chains, mode, engine='biopython', seed_k=0, **kwargs))
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_suffix_engine_matches_aligner_on_seeded_library(seed):
+    chains, planted_hits = benchmark.generate_library(40, 60, planted=8, planted_length=12, seed=seed)
+    expected = reference_pairings(chains, 'strict')
+    # 默认的种子预筛选不能漏掉任何配对
+    for seed_k in (0, None):
+        actual = IriSeq.find_pairings(chains, 'strict', engine='suffix', seed_k=seed_k)
+        assert set(actual) == expected
+    assert benchmark.count_planted_found(expected, planted_hits) == len(planted_hits)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_suffix_engine_matches_aligner_on_ties(seed):
+    # 重复单元的链有大量等分比对，两者选取的比对区域也必须相同
+    chains = benchmark.generate_tie_library(40, seed)
+    expected = reference_pairings(chains, 'strict')
+    assert set(IriSeq.find_pairings(chains, 'strict', engine='suffix', seed_k=0)) == expected
+
+
+def test_suffix_engine_respects_min_length():
+    chains = benchmark.generate_tie_library(30, 3)
+    for min_length in (3, 8):
+        expected = reference_pairings(chains, 'strict', min_length=min_length)
+        actual = IriSeq.find_pairings(chains, 'strict', engine='suffix', min_length=min_length)
+        assert set(actual) == expected
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_numpy_engine_matches_aligner_on_seeded_library(seed):
+    chains, _ = benchmark.generate_library(30, 60, planted=6, planted_length=12, seed=seed)
+    expected = reference_pairings(chains, 'relaxed')
+    assert set(IriSeq.find_pairings(chains, 'relaxed', engine='numpy', seed_k=0)) == expected
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_numpy_engine_matches_aligner_on_ties(seed):
+    # 等分的最优比对很多：终点取行优先顺序的第一个最高分单元，回溯时优先空位，与 PairwiseAligner 一致
+    chains = benchmark.generate_tie_library(40, seed)
+    expected = reference_pairings(chains, 'relaxed')
+    assert set(IriSeq.find_pairings(chains, 'relaxed', engine='numpy', seed_k=0)) == expected
+
+
+def test_numpy_engine_matches_aligner_for_custom_scoring():
+    chains = benchmark.generate_tie_library(30, 4)
+    scoring = IriSeq.parse_scoring_profile('loose=2,-1,-3,6')
+    expected = IriSeq.find_profile_pairings(chains, [scoring], engine='biopython', seed_k=0)
+    actual = IriSeq.find_profile_pairings(chains, [scoring], engine='numpy', seed_k=0)
+    assert set(actual['loose']) == set(expected['loose'])
+
+
+def test_numpy_multiple_sites_extend_best_site():
+    chains = benchmark.generate_tie_library(30, 5)
+    best = set(IriSeq.find_pairings(chains, 'relaxed', engine='numpy', seed_k=0))
+    sites = IriSeq.find_pairings(chains, 'relaxed', engine='numpy', seed_k=0, max_sites=3)
+    by_pair = {}
+    for pairing in sites:
+        by_pair.setdefault(pairing[:2], []).append(pairing)
+    # 每对链的第一个位点就是最优配对；两个位点不能在两条链上同时重叠
+    assert {found[0] for found in by_pair.values()} == best
+    for found in by_pair.values():
+        assert len(found) <= 3
+        for k, first in enumerate(found):
+            for second in found[k + 1:]:
+                assert (first[3] < second[2] or second[3] < first[2]
+                        or first[5] < second[4] or second[5] < first[4])
+
+
+def write_text(path, text, compress=False):
+    if compress:
+        with gzip.open(path, 'wt') as f:
+            f.write(text)
+    else:
+        path.write_text(text)
+    return str(path)
+
+
+def test_read_multiline_fastq(tmp_path):
+    # 序列与质量值跨多行，质量行以 @ 开头时也不能被当作下一条记录
+    filename = write_text(tmp_path / 'reads.fq', "@read1 first\nACGT\nAC\n+\n@III\nII\n@read2\nGGCC\n+read2\n!!!!\n")
+    chains, mode = IriSeq.read_sequences_from_file(filename)
+    assert dict(chains) == {'read1': 'ACGTAC', 'read2': 'GGCC'}
+    assert mode == 'strict'
+
+
+def test_read_truncated_fastq(tmp_path):
+    filename = write_text(tmp_path / 'reads.fq', "@read1\nACGTAC\n+\nIII\n")
+    with pytest.raises(ValueError, match="质量行不完整"):
+        IriSeq.read_sequences_from_file(filename)
+
+
+@pytest.mark.parametrize('suffix, text', [
+    ('fa', ">a desc\nacgu\nAC\n>b\nGGcc\n"),
+    ('fq', "@a\nacgu\nAC\n+\nIIIIII\n@b\nGGcc\n+\nIIII\n"),
+    ('txt', "relaxed\na: acguAC\nb: GGcc\n"),
+])
+def test_read_gzip_mixed_case_and_u(tmp_path, suffix, text):
+    plain = IriSeq.read_sequences_from_file(write_text(tmp_path / f'chains.{suffix}', text))
+    compressed = IriSeq.read_sequences_from_file(write_text(tmp_path / f'chains.{suffix}.gz', text, compress=True))
+    assert dict(plain[0]) == dict(compressed[0]) == {'a': 'ACGTAC', 'b': 'GGCC'}
+    assert plain[1] == compressed[1] == ('relaxed' if suffix == 'txt' else 'strict')
+
+
+@pytest.mark.parametrize('text, message', [
+    (">a\nACGNT\n", "简并碱基 N"),
+    ("a: ACGXT\n", "非法字符"),
+    (">a\nACGT\n>a\nGGCC\n", "链名 a 重复"),
+    (">a\n\n>b\nACGT\n", "序列为空"),
+    ("ACGT\n>b\n", "非法字符"),
+])
+def test_read_rejects_invalid_input(tmp_path, text, message):
+    with pytest.raises(ValueError, match=message):
+        IriSeq.read_sequences_from_file(write_text(tmp_path / 'chains.txt', text))
+
+
+def test_read_text_without_names(tmp_path):
+    filename = write_text(tmp_path / 'chains.txt', "\n# comment\nACGT\nb: GGCC\nTTAA\n")
+    chains, mode = IriSeq.read_sequences_from_file(filename)
+    assert dict(chains) == {'Chain1': 'ACGT', 'b': 'GGCC', 'Chain3': 'TTAA'}
+    assert mode == 'strict'